@@ -4,7 +4,6 @@ from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from pathlib import Path
-import gc
 import asyncio
 import sys
 
@@ -77,26 +76,17 @@ async def lifespan(app: FastAPI):
 
     # Initialize MuseTalk models (optional, only if needed)
     try:
-        from src.services.musetalk import (
-            initialize_musetalk_on_startup,
-            get_musetalk_realtime_service,
-        )
+        from src.services.musetalk import initialize_musetalk_on_startup
+
+        from src.services import avatar_job_runner
 
         logger.info("Initializing MuseTalk models...")
         success = initialize_musetalk_on_startup()
-        musetalk = get_musetalk_realtime_service()
 
+        # Unprepared default avatars are prepared in the background
         for avatar in avatars:
             if not avatar.is_prepared:
-                avatar_id = avatar.id
-                video_path = avatar.video_path
-                preparation = not avatar.is_prepared
-                musetalk.prepare_avatar(avatar_id, video_path, preparation)
-
-        musetalk._avatars.clear()
-        del musetalk._current_avatar
-        del musetalk
-        gc.collect()
+                avatar_job_runner.submit(avatar.id, avatar.video_path, preparation=True)
 
         # success = True
         if success:
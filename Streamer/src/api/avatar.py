@@ -9,14 +9,15 @@ from fastapi import (
 )
 from typing import List
 from pathlib import Path
-import gc
 
 from ..database import get_db, AvatarDatabaseService
 from ..models import (
     AvatarCreate,
     AvatarUpdate,
     AvatarResponse,
+    AvatarJobResponse,
 )
+from ..services import avatar_job_runner
 
 import logging
 
@@ -67,6 +68,106 @@ async def get_avatars(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ===== PREPARATION JOB ENDPOINTS =====
+@router.get("/jobs", response_model=List[AvatarJobResponse])
+async def list_preparation_jobs():
+    """List avatar preparation jobs (most recent first)"""
+    return [job.to_dict() for job in avatar_job_runner.list_jobs()]
+
+
+@router.get("/jobs/{job_id}", response_model=AvatarJobResponse)
+async def get_preparation_job(job_id: str):
+    """Get progress percentage and ETA of a preparation job"""
+    job = avatar_job_runner.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.get("/{avatar_id}/preparation", response_model=AvatarJobResponse)
+async def get_avatar_preparation(avatar_id: int):
+    """Get the latest preparation job of an avatar"""
+    job = avatar_job_runner.get_avatar_job(avatar_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No preparation job for avatar")
+    return job.to_dict()
+
+
+@router.post("/{avatar_id}/prepare", response_model=AvatarJobResponse)
+async def prepare_avatar(avatar_id: int, db: Session = Depends(get_db)):
+    """Queue (re)preparation of an avatar in the background"""
+    avatar = AvatarDatabaseService.get_avatar_by_id(db, avatar_id)
+    if not avatar:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    job = avatar_job_runner.submit(avatar.id, avatar.video_path, preparation=True)
+    return job.to_dict()
+
+
+# ===== RESIDENCY ENDPOINTS =====
+@router.get("/residency/status")
+def residency_status():
+    """Memory budget and per-avatar memory of loaded avatars"""
+    from ..services.musetalk import get_musetalk_realtime_service
+
+    return get_musetalk_realtime_service().memory_stats()
+
+
+@router.post("/{avatar_id}/preload")
+def preload_avatar(avatar_id: int, pin: bool = False, db: Session = Depends(get_db)):
+    """Load a prepared avatar into memory (optionally pinned) ahead of a session"""
+    from ..services.musetalk import get_musetalk_realtime_service
+
+    avatar = AvatarDatabaseService.get_avatar_by_id(db, avatar_id)
+    if not avatar:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    if not avatar.is_prepared:
+        raise HTTPException(status_code=409, detail="Avatar is not prepared yet")
+    service = get_musetalk_realtime_service()
+    if not service.preload_avatar(avatar.id, avatar.video_path, pin=pin):
+        raise HTTPException(status_code=500, detail="Failed to preload avatar")
+    return {
+        "status": "success",
+        "avatar_id": avatar.id,
+        "pinned": service.is_avatar_pinned(avatar.id),
+    }
+
+
+@router.post("/{avatar_id}/pin")
+def pin_avatar(avatar_id: int):
+    """Keep a loaded avatar in memory regardless of the memory budget"""
+    from ..services.musetalk import get_musetalk_realtime_service
+
+    if not get_musetalk_realtime_service().pin_avatar(avatar_id):
+        raise HTTPException(status_code=409, detail="Avatar is not loaded")
+    return {"status": "success", "avatar_id": avatar_id, "pinned": True}
+
+
+@router.delete("/{avatar_id}/pin")
+def unpin_avatar(avatar_id: int):
+    """Let a pinned avatar be evicted again under memory pressure"""
+    from ..services.musetalk import get_musetalk_realtime_service
+
+    get_musetalk_realtime_service().unpin_avatar(avatar_id)
+    return {"status": "success", "avatar_id": avatar_id, "pinned": False}
+
+
+@router.delete("/{avatar_id}/memory")
+def unload_avatar(avatar_id: int, force: bool = False):
+    """Free the memory of a loaded avatar; pinned avatars are only dropped with force"""
+    from ..services.musetalk import get_musetalk_realtime_service
+
+    service = get_musetalk_realtime_service()
+    if not service.is_avatar_loaded(avatar_id):
+        raise HTTPException(status_code=404, detail="Avatar is not loaded")
+    if not service.unload_avatar(avatar_id, force=force):
+        if service.is_avatar_pinned(avatar_id) and not force:
+            detail = "Avatar is pinned; unpin it or pass force=true"
+        else:
+            detail = "Avatar is active or in use by a session"
+        raise HTTPException(status_code=409, detail=detail)
+    return {"status": "success", "avatar_id": avatar_id}
+
+
 @router.get("/{avatar_id}", response_model=AvatarResponse)
 async def get_avatar_by_id(avatar_id: int, db: Session = Depends(get_db)):
     """Get avatar by ID"""
@@ -85,19 +186,9 @@ async def create_avatar(avatar_data: AvatarCreate, db: Session = Depends(get_db)
         )
         
         
-        from src.services.musetalk import get_musetalk_realtime_service
-
-        musetalk = get_musetalk_realtime_service()
-        
+        # Preparation runs in the background; progress via /avatars/jobs/{job_id}
         if not avatar.is_prepared:
-            avatar_id = avatar.id
-            video_path = avatar.video_path
-            preparation = not avatar.is_prepared
-            musetalk.prepare_avatar(avatar_id, video_path, preparation)
-            
-            musetalk._avatars.clear()
-            del musetalk._current_avatar
-            del musetalk; gc.collect()
+            avatar_job_runner.submit(avatar.id, avatar.video_path, preparation=True)
 
         return avatar
     except Exception as e:
@@ -1,6 +1,9 @@
+import os
+
 from sqlalchemy.orm import Session
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
 from ..services import webrtc_service, stream_processor
 from ..models import Offer
 from ..database import get_db
@@ -100,12 +103,57 @@ async def musetalk_status():
         service = get_musetalk_realtime_service()
         return {
             "initialized": service.is_ready(),
-            "loaded_avatars": list(service._avatars.keys()) if service._avatars else [],
+            "loaded_avatars": service.loaded_avatar_ids(),
+            "memory": service.memory_stats(),
+            "pipeline": service.generation_metrics(),
+            "batch_tuner": service.batch_tuner_status(),
+            "profile": service.profile.describe() if service.profile else None,
+            "backend": service.backend_status,
+            "quantization": service.quantization_status(),
+            "scheduler": service.scheduler_stats(),
+            "render_cache": service.render_cache.stats() if service.render_cache else None,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/musetalk/quantization/{mode}")
+def build_quantized_models(
+    mode: str, avatar_id: str, audio_path: str = None, rebuild: bool = False
+):
+    """
+    Build (or rebuild) the int8 models of a mode, calibrated on a loaded
+    avatar, and return their quality report against fp32. ``audio_path``, if
+    given, must be a TTS output (under the audio output directory).
+    """
+    try:
+        from src.services.musetalk import get_musetalk_realtime_service
+        from src.services.quantization import QUANTIZATION_MODES
+
+        service = get_musetalk_realtime_service()
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"mode must be one of {QUANTIZATION_MODES}")
+        if not service.is_ready():
+            raise ValueError("MuseTalk models not loaded")
+        avatar = service.get_loaded_avatar(avatar_id)
+        if avatar is None:
+            raise ValueError(f"Avatar {avatar_id} is not loaded")
+        if audio_path:
+            audio_dir = os.path.realpath(stream_processor.tts_service.output_dir)
+            audio_path = os.path.realpath(audio_path)
+            if os.path.commonpath([audio_dir, audio_path]) != audio_dir:
+                raise ValueError("audio_path must be inside the audio output directory")
+            if not os.path.isfile(audio_path):
+                raise ValueError(f"Audio file {audio_path} not found")
+        # Sync route: FastAPI runs it in a worker thread while calibration runs
+        quantized = service.quantize(mode, avatar, audio_path, rebuild)
+        return quantized.report
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/realtime/start")
 async def start_product(session_id: str, product_id: str, db: Session = Depends(get_db)):
     """
@@ -115,6 +163,14 @@ async def start_product(session_id: str, product_id: str, db: Session = Depends(
         result = await stream_processor.start_product(db, session_id, product_id)
         if result.get("status") == "error":
             raise HTTPException(status_code=400, detail=result.get("detail"))
+        if result.get("status") == "busy":
+            # Avatar preparation job still running; the client retries later
+            raise HTTPException(
+                status_code=409,
+                detail=jsonable_encoder(
+                    {"detail": result.get("detail"), "job": result.get("job")}
+                ),
+            )
         return result
     except HTTPException:
         raise
@@ -32,6 +32,7 @@ class StreamSessionDatabaseService:
                 wait_duration=session_data.wait_duration,
                 stream_fps=session_data.fps,
                 batch_size=session_data.batch_size,
+                quantization=session_data.quantization,
             )
             db.add(db_session)
             db.commit()
@@ -1,7 +1,7 @@
 # Import Base first
 from .models import Base
 
-from .avatar import Avatar, AvatarCreate, AvatarUpdate, AvatarResponse
+from .avatar import Avatar, AvatarCreate, AvatarUpdate, AvatarResponse, AvatarJobResponse
 from .comment import Comment, CommentCreate, CommentResponse
 from .product import Product, ProductCreate, ProductUpdate, ProductResponse, ProductStatsResponse, PaginatedProductResponse
 from .stream_session import StreamSession, StreamProduct, StreamSessionCreate, StreamSessionResponse, StreamProductResponse
@@ -35,6 +35,7 @@ __all__ = [
     
     # Pydantic Response Schemas
     "AvatarResponse",
+    "AvatarJobResponse",
     "CommentResponse",
     "ProductResponse",
     "ProductStatsResponse",
@@ -92,6 +92,19 @@ class AvatarUpdate(BaseModel):
     name: Optional[str] = None
 
 
+class AvatarJobResponse(BaseModel):
+    job_id: str
+    avatar_id: int
+    status: str  # queued, running, done, failed
+    stage: Optional[str] = None
+    progress: float  # percent
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class AvatarResponse(BaseModel):
     id: int
     video_path: str
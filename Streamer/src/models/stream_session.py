@@ -42,6 +42,7 @@ class StreamSession(Base):
     
     stream_fps = Column(Integer, default=25)
     batch_size = Column(Integer, default=4)
+    quantization = Column(String(20), nullable=True)  # None, dynamic, static
 
     # Relationships
     avatar = relationship("Avatar", back_populates="stream_sessions")
@@ -80,7 +81,8 @@ class StreamSessionCreate(BaseModel):
     for_stream: Optional[bool] = False
     wait_duration: Optional[int] = 10
     fps: Optional[int] = 25
-    batch_size: Optional[int] = 4
+    batch_size: Optional[int] = 4  # 0 = auto-tune for the fps on this device
+    quantization: Optional[str] = None  # "dynamic" / "static" int8 models (CPU only)
 
 
 class StreamSessionResponse(BaseModel):
@@ -97,6 +99,7 @@ class StreamSessionResponse(BaseModel):
     wait_duration: Optional[int]
     fps: Optional[int] = Field(alias="stream_fps")
     batch_size: Optional[int]
+    quantization: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -1,9 +1,11 @@
 from .stream import stream_processor
 from .webrtc import webrtc_service
 from .chat import ChatManager
+from .avatar_jobs import avatar_job_runner
 
 __all__ = [
     "stream_processor",
     "webrtc_service",
     "ChatManager",
+    "avatar_job_runner",
 ]
\ No newline at end of file
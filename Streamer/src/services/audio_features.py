@@ -0,0 +1,270 @@
+import os
+import json
+import math
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+# Whisper: 16 kHz input, encoder features at 50 per second
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_FEATURE_FPS = 50
+
+
+def whisper_frame_count(librosa_length, fps):
+    """Number of video frames (whisper chunks) for an audio of ``librosa_length`` samples."""
+    return math.floor((librosa_length / AUDIO_SAMPLE_RATE) * int(fps))
+
+
+def _zero_features(like, length):
+    """``length`` zero features shaped and typed like the (b, n, layers, dim) ``like``."""
+    return like.new_zeros((like.shape[0], length) + tuple(like.shape[2:]))
+
+
+def iter_whisper_chunks(
+    whisper_input_features,
+    librosa_length,
+    whisper,
+    device,
+    weight_dtype,
+    fps=25,
+    audio_padding_length_left=2,
+    audio_padding_length_right=2,
+):
+    """
+    Incremental version of MuseTalk's ``AudioProcessor.get_whisper_chunk``.
+
+    Runs the Whisper encoder one 30 s window at a time and yields, after each
+    window, a (n, 10 * layers, 384) tensor with the chunks of every frame
+    whose audio context is complete. Concatenated, the yields equal the
+    tensor ``get_whisper_chunk`` returns, but the first frames are available
+    after a single encoder pass.
+    """
+    fps = int(fps)
+    feature_length = 2 * (audio_padding_length_left + audio_padding_length_right + 1)
+    multiplier = AUDIO_FEATURE_FPS / fps
+    padding_nums = math.ceil(multiplier)
+    num_frames = whisper_frame_count(librosa_length, fps)
+    actual_length = math.floor((librosa_length / AUDIO_SAMPLE_RATE) * AUDIO_FEATURE_FPS)
+
+    parts = []
+    left_pad = padding_nums * audio_padding_length_left
+    available = 0  # encoder features kept so far (trimmed to actual_length)
+    next_frame = 0
+
+    def emit(upto):
+        nonlocal next_frame
+        feature = torch.cat(parts, dim=1)
+        clips = []
+        while next_frame < num_frames:
+            start = math.floor(next_frame * multiplier)
+            if start + feature_length > upto:
+                break
+            clips.append(feature[:, start : start + feature_length])
+            next_frame += 1
+        if not clips:
+            return None
+        prompts = torch.cat(clips, dim=0)  # n, 10, layers, 384
+        return prompts.reshape(prompts.shape[0], -1, prompts.shape[-1])
+
+    with torch.no_grad():
+        for input_feature in whisper_input_features:
+            input_feature = input_feature.to(device).to(weight_dtype)
+            hidden = whisper.encoder(input_feature, output_hidden_states=True).hidden_states
+            window = torch.stack(hidden, dim=2)[:, : max(0, actual_length - available)]
+            if not parts:
+                parts.append(_zero_features(window, left_pad))
+            parts.append(window)
+            available += window.shape[1]
+            chunks = emit(left_pad + available)
+            if chunks is not None:
+                yield chunks
+            if available >= actual_length:
+                break
+        if parts and next_frame < num_frames:
+            # Full-length padding, as the reference pads the whole feature:
+            # the last window may hold fewer features than the padding
+            parts.append(
+                _zero_features(parts[-1], padding_nums * 3 * audio_padding_length_right)
+            )
+            chunks = emit(
+                left_pad + available + padding_nums * 3 * audio_padding_length_right
+            )
+            if chunks is not None:
+                yield chunks
+    if next_frame < num_frames:
+        logger.warning(f"Whisper features cover {next_frame} of {num_frames} frames")
+
+
+def prefetch(iterable, max_ahead=2):
+    """
+    Iterate ``iterable`` on a background thread, keeping up to ``max_ahead``
+    items ready, so producing the next item overlaps with consuming this one.
+    """
+    items = queue.Queue(maxsize=max_ahead)
+    end = object()
+    stop = threading.Event()
+    error = []
+
+    def run():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    break
+                items.put(item)
+        except Exception as e:
+            error.append(e)
+        finally:
+            items.put(end)
+
+    thread = threading.Thread(target=run, name="audio-feature-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is end:
+                break
+            yield item
+        if error:
+            raise error[0]
+    finally:
+        stop.set()
+        # unblock the producer if the consumer stopped early
+        while thread.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
+
+
+def iter_frames(chunk_blocks):
+    """Flatten (n, ...) blocks into per-frame tensors (what ``datagen`` iterates)."""
+    for block in chunk_blocks:
+        for chunk in block:
+            yield chunk
+
+
+class WhisperFeatureCache:
+    """
+    Whisper chunks of already seen audio, stored as fp16 ``.npy`` files under
+    ``root`` and opened memory-mapped. Entries are keyed by the audio content
+    digest, fps and padding lengths; the most recently used mappings are
+    kept open in memory.
+    """
+
+    def __init__(self, root, memory_entries=16):
+        self.root = root
+        self.memory_entries = memory_entries
+        self._open = OrderedDict()
+        # Guards the open mappings and the counters (sessions share the cache)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(audio_digest, fps, audio_padding_length_left, audio_padding_length_right):
+        params = json.dumps(
+            {
+                "audio": audio_digest,
+                "fps": int(fps),
+                "left": audio_padding_length_left,
+                "right": audio_padding_length_right,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(params.encode("utf-8")).hexdigest()[:24]
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.npy")
+
+    def get(self, key):
+        """Memory-mapped (frames, 10 * layers, 384) fp16 chunks, or None."""
+        with self._lock:
+            chunks = self._open.get(key)
+            if chunks is not None:
+                self._open.move_to_end(key)
+                self.hits += 1
+                return chunks
+        try:
+            chunks = np.load(self._path(key), mmap_mode="r")
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable whisper feature cache {key}: {e}")
+            with self._lock:
+                self.misses += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        with self._lock:
+            self._open[key] = chunks
+            while len(self._open) > self.memory_entries:
+                self._open.popitem(last=False)
+                self.evictions += 1
+            self.hits += 1
+        return chunks
+
+    def record(self, key, chunk_blocks, num_frames):
+        """
+        Pass ``chunk_blocks`` through while writing them to the cache. The
+        entry only becomes visible once all ``num_frames`` were written.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp.npy"
+        writer = None
+        written = 0
+        try:
+            for block in chunk_blocks:
+                array = block.detach().to("cpu", torch.float16).numpy()
+                if writer is None:
+                    writer = np.lib.format.open_memmap(
+                        tmp_path, mode="w+", dtype=np.float16,
+                        shape=(num_frames,) + array.shape[1:],
+                    )
+                count = min(len(array), num_frames - written)
+                writer[written : written + count] = array[:count]
+                written += count
+                yield block
+        finally:
+            if writer is not None:
+                writer.flush()
+                del writer
+                if written == num_frames:
+                    os.replace(tmp_path, path)
+                elif os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "open": len(self._open),
+            }
+
+
+def iter_cached_chunks(chunks, dtype, block_size=256):
+    """Per-frame tensors (``dtype``) from memory-mapped cached chunks."""
+    for start in range(0, len(chunks), block_size):
+        block = torch.from_numpy(np.array(chunks[start : start + block_size])).to(dtype)
+        for chunk in block:
+            yield chunk
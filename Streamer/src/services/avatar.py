@@ -8,14 +8,29 @@ import sys
 from tqdm import tqdm
 import json
 import time
-import queue
+import hashlib
 import threading
 import numpy as np
-import subprocess
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 import shutil
 import logging
 
+from .avatar_bundle import open_bundle, pack_ragged, unpack_ragged, write_bundle
+from .avatar_checkpoint import PrepCheckpoint
+from .avatar_transcode import iter_transcoded_frames
+from .avatar_pipeline import GenerationPipeline
+from .render_cache import replay_segment
+from .audio_features import (
+    iter_cached_chunks,
+    iter_frames,
+    iter_whisper_chunks,
+    prefetch,
+    whisper_frame_count,
+)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
@@ -28,24 +43,616 @@ def osmakedirs(path_list):
         os.makedirs(path) if not os.path.exists(path) else None
 
 
-def video2imgs(vid_path, save_path, ext=".png", cut_frame=10000000):
+def add_musetalk_path(path):
+    """
+    Make the MuseTalk checkout importable. The working directory is left
+    alone: the server resolves its database, static files and outputs
+    relative to it while preparation and generation run.
+    """
+    path = os.path.abspath(str(path))
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def iter_video_frames(vid_path, cut_frame=10000000, skip=0):
+    """Decode a video and yield its BGR frames one by one (after ``skip`` frames)."""
     cap = cv2.VideoCapture(vid_path)
-    count = 0
-    while True:
-        if count > cut_frame:
-            break
-        ret, frame = cap.read()
-        if ret:
-            cv2.imwrite(f"{save_path}/{count:08d}.png", frame)
+    try:
+        count = 0
+        while count < skip and cap.grab():
+            count += 1
+        while count <= cut_frame:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
             count += 1
+    finally:
+        cap.release()
+
+
+def iter_image_dir(dir_path, skip=0):
+    """Yield the PNG frames of a directory in file name order."""
+    files = sorted(f for f in os.listdir(dir_path) if f.split(".")[-1] == "png")
+    for filename in files[skip:]:
+        yield cv2.imread(os.path.join(dir_path, filename))
+
+
+def iter_chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# (path, size, mtime_ns) -> content digest, so unchanged videos are hashed once
+_digest_memo = {}
+_digest_lock = threading.Lock()
+# cache key -> lock, so identical avatars are never prepared twice at once
+_prepare_locks = {}
+
+
+def _file_digest(path, hasher):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+
+
+def video_digest(path):
+    """SHA-256 of the avatar source content (video file or PNG frame directory)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if memo_key in _digest_memo:
+            return _digest_memo[memo_key]
+    hasher = hashlib.sha256()
+    if os.path.isdir(path):
+        for filename in sorted(f for f in os.listdir(path) if f.split(".")[-1] == "png"):
+            hasher.update(filename.encode("utf-8"))
+            _file_digest(os.path.join(path, filename), hasher)
+    else:
+        _file_digest(path, hasher)
+    digest = hasher.hexdigest()
+    with _digest_lock:
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+def avatar_cache_key(digest, bbox_shift, version, extra_margin, parsing_mode, compress=None):
+    """Directory name of a prepared avatar: same content + params -> same artifact."""
+    params = {
+        "video": digest,
+        "bbox_shift": bbox_shift,
+        "version": version,
+        "extra_margin": extra_margin,
+        "parsing_mode": parsing_mode,
+    }
+    if compress:
+        params["compress"] = compress
+    params = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()[:24]
+
+
+# Compressed copy written next to a compressed avatar's source video
+COMPRESSED_SUFFIX = ".compressed.mp4"
+
+# maker if the bbox is not sufficient
+COORD_PLACEHOLDER = (0.0, 0.0, 0.0, 0.0)
+
+# Face parser owned by each preparation worker process
+_worker_fp = None
+
+
+def _init_prepare_worker(musetalk_abs_path, version):
+    """Process pool initializer: make MuseTalk importable and load a face parser."""
+    global _worker_fp
+    os.chdir(musetalk_abs_path)
+    if musetalk_abs_path not in sys.path:
+        sys.path.insert(0, musetalk_abs_path)
+
+    from musetalk.utils.face_parsing import FaceParsing
+
+    if version == "v15":
+        _worker_fp = FaceParsing(left_cheek_width=90, right_cheek_width=90)
+    else:
+        _worker_fp = FaceParsing()
+
+
+def _landmark_shard(start, stop, frames_path, shape, bbox_shift):
+    start_time = time.time()
+    frames = np.memmap(frames_path, dtype=np.uint8, mode="r", shape=shape)
+    coords = get_landmark_and_bbox_from_frames(frames[start:stop], bbox_shift)
+    return start, coords, time.time() - start_time
+
+
+def _mask_shard(start, stop, frames_path, shape, coords, mode, batch_size):
+    start_time = time.time()
+    frames = np.memmap(frames_path, dtype=np.uint8, mode="r", shape=shape)
+    masks, crop_boxes = [], []
+    for i in range(start, stop, batch_size):
+        end = min(i + batch_size, stop)
+        batch_masks, batch_crop_boxes = prepare_masks_batched(
+            [np.array(frame) for frame in frames[i:end]],
+            coords[i - start : end - start],
+            _worker_fp,
+            mode,
+        )
+        masks.extend(batch_masks)
+        crop_boxes.extend(batch_crop_boxes)
+    return start, masks, crop_boxes, time.time() - start_time
+
+
+def get_landmark_and_bbox_from_frames(frames, upperbondrange=0):
+    """
+    In-memory counterpart of MuseTalk's ``get_landmark_and_bbox``: same face
+    detector, landmark model and bbox rules, but takes decoded BGR frames
+    instead of image paths, so frames never round-trip through PNG files.
+    """
+    from mmpose.apis import inference_topdown
+    from mmpose.structures import merge_data_samples
+    from musetalk.utils.preprocessing import model, fa
+
+    coords_list = []
+    for frame in frames:
+        frame = np.asarray(frame)
+        results = merge_data_samples(inference_topdown(model, frame))
+        keypoints = results.pred_instances.keypoints
+        face_land_mark = keypoints[0][23:91].astype(np.int32)
+
+        bbox = fa.get_detections_for_batch(np.asarray([frame]))[0]
+        if bbox is None:  # no face in the image
+            coords_list.append(COORD_PLACEHOLDER)
+            continue
+
+        half_face_coord = face_land_mark[29]
+        if upperbondrange != 0:
+            half_face_coord[1] = upperbondrange + half_face_coord[1]
+        half_face_dist = np.max(face_land_mark[:, 1]) - half_face_coord[1]
+        upper_bond = max(0, half_face_coord[1] - half_face_dist)
+        f_landmark = (
+            np.min(face_land_mark[:, 0]),
+            int(upper_bond),
+            np.max(face_land_mark[:, 0]),
+            np.max(face_land_mark[:, 1]),
+        )
+        x1, y1, x2, y2 = f_landmark
+        if y2 - y1 <= 0 or x2 - x1 <= 0 or x1 < 0:
+            # landmark bbox is not suitable, reuse the detector bbox
+            coords_list.append(bbox)
+        else:
+            coords_list.append(f_landmark)
+    return coords_list
+
+
+@torch.no_grad()
+def encode_latents_batched(vae, crops):
+    """
+    Batched equivalent of ``vae.get_latents_for_unet`` for a list of 256x256
+    BGR crops: masked and reference images of the whole batch go through one
+    VAE encoder forward pass. Returns one [1, 8, h, w] latent per crop.
+    """
+    masked = [vae.preprocess_img(crop, half_mask=True) for crop in crops]
+    ref = [vae.preprocess_img(crop, half_mask=False) for crop in crops]
+    latents = vae.encode_latents(torch.cat(masked + ref, dim=0))
+    masked_latents, ref_latents = latents[: len(crops)], latents[len(crops) :]
+    return list(torch.cat([masked_latents, ref_latents], dim=1).split(1, dim=0))
+
+
+class _ReplayParser:
+    """
+    Stand-in for a FaceParsing instance whose network output was already
+    computed as part of a batch. Calling it runs the parser's own
+    resize/post-processing, but the forward pass returns ``out``.
+    """
+
+    def __init__(self, fp, out):
+        self._fp = copy.copy(fp)
+        self._fp.net = lambda img: (out,)
+        # The input is ignored by the replayed net; skip normalizing it again
+        self._fp.preprocess = lambda image: torch.zeros(3, 1, 1)
+
+    def __call__(self, *args, **kwargs):
+        return self._fp(*args, **kwargs)
+
+
+@torch.no_grad()
+def prepare_masks_batched(frames, coords, fp, mode):
+    """
+    Batched equivalent of calling ``get_image_prepare_material`` per frame: the
+    face-parsing network runs once over all face crops of the batch.
+    """
+    from PIL import Image
+    from musetalk.utils.blending import get_crop_box, get_image_prepare_material
+
+    device = next(fp.net.parameters()).device
+    inputs = []
+    for frame, bbox in zip(frames, coords):
+        crop_box, _ = get_crop_box(list(bbox), 1.5)
+        face_large = Image.fromarray(frame[:, :, ::-1]).crop(crop_box)
+        inputs.append(fp.preprocess(face_large.resize((512, 512), Image.BILINEAR)))
+    outs = fp.net(torch.stack(inputs).to(device))[0]
+
+    masks, crop_boxes = [], []
+    for i, (frame, (x1, y1, x2, y2)) in enumerate(zip(frames, coords)):
+        mask, crop_box = get_image_prepare_material(
+            frame,
+            [x1, y1, x2, y2],
+            fp=_ReplayParser(fp, outs[i : i + 1]),
+            mode=mode,
+        )
+        masks.append(mask)
+        crop_boxes.append(crop_box)
+    return masks, crop_boxes
+
+
+def _coords_from_array(arr):
+    return [COORD_PLACEHOLDER if not row.any() else row.tolist() for row in arr]
+
+
+def _latents_to_array(latents):
+    if not latents:
+        return np.zeros((0,), dtype=np.float16)
+    latents = torch.cat([latent.detach().float().cpu() for latent in latents], dim=0)
+    return latents.numpy().astype(np.float16)
+
+
+def _latents_from_array(arr):
+    return [torch.from_numpy(arr[i : i + 1].copy()) for i in range(len(arr))]
+
+
+def _masks_to_arrays(masks, crop_boxes):
+    data, offsets, shapes = pack_ragged(masks)
+    return {
+        "data": data,
+        "offsets": offsets,
+        "shapes": shapes,
+        "crop_boxes": np.asarray(crop_boxes, dtype=np.int32).reshape(-1, 4),
+    }
+
+
+def mask_to_roi(mask, crop_box, bbox, frame_shape):
+    """
+    Reduce a ``get_image_prepare_material`` mask (sized like ``crop_box``) to the
+    only region where blending can change pixels: its non-zero area inside the
+    face bbox (outside the bbox the blend mixes the frame with itself).
+
+    Returns (single-channel mask crop, [x1, y1, x2, y2] box in frame coordinates).
+    """
+    if mask.ndim == 3:
+        mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
+    x_s, y_s = int(crop_box[0]), int(crop_box[1])
+    x1, y1, x2, y2 = (int(v) for v in bbox)
+    ys, xs = np.nonzero(mask)
+    if len(xs) == 0:
+        return np.zeros((0, 0), dtype=np.uint8), [x1, y1, x1, y1]
+    rx1 = max(int(xs.min()) + x_s, x1, 0)
+    ry1 = max(int(ys.min()) + y_s, y1, 0)
+    rx2 = min(int(xs.max()) + 1 + x_s, x2, frame_shape[1])
+    ry2 = min(int(ys.max()) + 1 + y_s, y2, frame_shape[0])
+    if rx2 <= rx1 or ry2 <= ry1:
+        return np.zeros((0, 0), dtype=np.uint8), [x1, y1, x1, y1]
+    roi = mask[ry1 - y_s : ry2 - y_s, rx1 - x_s : rx2 - x_s]
+    return np.ascontiguousarray(roi, dtype=np.uint8), [rx1, ry1, rx2, ry2]
+
+
+# Side of the faces produced by the VAE decoder
+FACE_SIZE = 256
+
+
+def build_blend_plan(coords, mask_boxes, face_size=FACE_SIZE):
+    """
+    Per-frame affine maps (N, 2, 3) from mask-ROI pixels to generated-face
+    pixels. Sampling a face through one of them gives exactly the ROI of the
+    face resized to its bbox, so the realtime path never resizes the full face.
+    Degenerate bboxes get an all-zero map (their ROI is empty).
+    """
+    plan = np.zeros((len(coords), 2, 3), dtype=np.float32)
+    for k, ((x1, y1, x2, y2), (mx1, my1, _, _)) in enumerate(zip(coords, mask_boxes)):
+        if x2 <= x1 or y2 <= y1:
+            continue
+        sx, sy = face_size / (x2 - x1), face_size / (y2 - y1)
+        # cv2.resize pixel centers: src = (dst + 0.5) * scale - 0.5
+        plan[k] = [
+            [sx, 0.0, (mx1 - x1 + 0.5) * sx - 0.5],
+            [0.0, sy, (my1 - y1 + 0.5) * sy - 0.5],
+        ]
+    return plan
+
+
+def blend_rois_batch(frames, faces, masks, mask_boxes):
+    """
+    Alpha-composite a batch in place: ``frames[k][box] = faces[k]*a + body*(1-a)``
+    with ``a = masks[k] / 255`` inside ``mask_boxes[k]``. Matches MuseTalk's
+    ``get_image_blending`` (to rounding) since pixels outside the mask ROI are
+    left unchanged by it.
+
+    ROIs are zero-padded to the largest one and composited in a single
+    integer-weighted pass over the whole batch.
+    """
+    items = [
+        (frame, face, mask, box)
+        for frame, face, mask, box in zip(frames, faces, masks, mask_boxes)
+        if box[2] > box[0] and box[3] > box[1]
+    ]
+    if not items:
+        return frames
+    height = max(box[3] - box[1] for _, _, _, box in items)
+    width = max(box[2] - box[0] for _, _, _, box in items)
+    face_stack = np.zeros((len(items), height, width, 3), dtype=np.uint16)
+    body_stack = np.zeros_like(face_stack)
+    alpha = np.zeros((len(items), height, width, 1), dtype=np.uint16)
+    for k, (frame, face, mask, (x1, y1, x2, y2)) in enumerate(items):
+        h, w = y2 - y1, x2 - x1
+        face_stack[k, :h, :w] = face
+        body_stack[k, :h, :w] = frame[y1:y2, x1:x2]
+        alpha[k, :h, :w, 0] = mask
+    # (face * a + body * (255 - a) + 127) / 255, rounded, all in uint16
+    face_stack *= alpha
+    body_stack *= 255 - alpha
+    face_stack += body_stack
+    face_stack += 127
+    face_stack //= 255
+    for k, (frame, _, _, (x1, y1, x2, y2)) in enumerate(items):
+        frame[y1:y2, x1:x2] = face_stack[k, : y2 - y1, : x2 - x1]
+    return frames
+
+
+class GenerationRun:
+    """
+    State of one generation run (one session's audio) on an avatar. Several
+    sessions may generate with the same avatar at once, so the frame index,
+    time to first frame and metrics of a run are kept here, not on the Avatar.
+    """
+
+    def __init__(self, session=None, avatar_id=None):
+        self.session = session
+        self.avatar_id = avatar_id
+        self.frame_index = 0  # index of the next frame to output
+        self.time_to_first_frame = None  # seconds from inference start
+        self.window = 0  # lazy frame window capacity this run needs
+        self.metrics = None  # per-stage pipeline metrics, once the run ends
+        self.finished = False
+
+    def to_dict(self):
+        return {
+            "session": str(self.session) if self.session is not None else None,
+            "avatar_id": self.avatar_id,
+            "frame_index": self.frame_index,
+            "time_to_first_frame": self.time_to_first_frame,
+            "finished": self.finished,
+            "pipeline": self.metrics,
+        }
+
+
+class FrameRing:
+    """
+    Output frames reused round-robin: frame ``idx`` is composed in buffer
+    ``idx % size``. A buffer is only reused after ``size`` newer frames were
+    produced, so ``size`` must cover every frame still queued downstream.
+
+    Buffers are allocated on first use. A buffer that already holds the same
+    base frame only gets its previously blended ROI restored; otherwise the
+    base frame is copied in without allocating.
+    """
+
+    def __init__(self, size):
+        self.size = max(1, int(size))
+        self._buffers = [None] * self.size
+        self._base = [None] * self.size  # base frame index held by each buffer
+        self._dirty = [None] * self.size  # box blended over it since
+        self.roi_restores = 0
+        self.full_copies = 0
+
+    def compose(self, idx, base_idx, base_frame, box):
+        """Buffer for frame ``idx`` holding a clean ``base_frame``; ``box`` will be overwritten."""
+        slot = idx % self.size
+        buf = self._buffers[slot]
+        if buf is None or buf.shape != base_frame.shape:
+            buf = self._buffers[slot] = np.empty_like(base_frame)
+            self._base[slot] = None
+        if self._base[slot] == base_idx:
+            dirty = self._dirty[slot]
+            if dirty is not None:
+                x1, y1, x2, y2 = dirty
+                buf[y1:y2, x1:x2] = base_frame[y1:y2, x1:x2]
+            self.roi_restores += 1
         else:
-            break
+            np.copyto(buf, base_frame)
+            self.full_copies += 1
+        self._base[slot] = base_idx
+        self._dirty[slot] = box
+        return buf
+
+
+def _log_stage_speedup(stage, num_frames, wall, busy, workers):
+    speedup = busy / wall if wall > 0 else 0.0
+    logger.info(
+        f"{stage}: {num_frames} frames in {wall:.2f}s on {workers} workers "
+        f"(worker time {busy:.2f}s, speedup x{speedup:.2f})"
+    )
+
+
+def iter_batches(whisper_chunks, latents, batch_size):
+    """
+    MuseTalk's ``datagen`` with a batch size that may change between batches:
+    ``batch_size`` is an int or a callable read before each batch.
+    """
+    size = batch_size if callable(batch_size) else (lambda: batch_size)
+    whisper_batch, latent_batch = [], []
+    for i, w in enumerate(whisper_chunks):
+        whisper_batch.append(w)
+        latent_batch.append(latents[i % len(latents)])
+        if len(latent_batch) >= size():
+            yield torch.stack(whisper_batch), torch.cat(latent_batch, dim=0)
+            whisper_batch, latent_batch = [], []
+    if latent_batch:
+        yield torch.stack(whisper_batch), torch.cat(latent_batch, dim=0)
+
+
+def cycle_position(idx, length):
+    """
+    Map a logical index of the ping-pong cycle (forward then reversed, period
+    ``2 * length``) to a position in the single stored sequence.
+    """
+    idx = idx % (2 * length)
+    return idx if idx < length else 2 * length - 1 - idx
+
+
+class PingPongCycle:
+    """
+    Read-only view equivalent to ``seq + seq[::-1]`` without materializing the
+    reversed copy. Indexes wrap around, so ``cycle[i]`` is valid for any i.
+    """
+
+    def __init__(self, seq):
+        self.seq = seq
+
+    def __len__(self):
+        return 2 * len(self.seq)
+
+    def __getitem__(self, idx):
+        return self.seq[cycle_position(idx, len(self.seq))]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+class LazyFrameSource:
+    """
+    Frames read on demand from a memory-mapped (N, H, W, 3) store.
+
+    Only an LRU window of decoded copies is kept in RAM; ``read_ahead`` loads
+    upcoming frames on a background thread so the blending loop never waits
+    on disk. Memory stays bounded by ``capacity`` frames whatever the avatar
+    length.
+    """
+
+    def __init__(self, frames, capacity=64):
+        self._frames = frames
+        self.capacity = max(1, int(capacity))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._reader = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def frame_nbytes(self):
+        return int(np.prod(self._frames.shape[1:])) * self._frames.dtype.itemsize
+
+    @property
+    def nbytes(self):
+        """Bytes currently held by the window (not counting the OS page cache)."""
+        with self._lock:
+            return len(self._cache) * self.frame_nbytes
+
+    def resize(self, capacity):
+        with self._lock:
+            self.capacity = max(1, int(capacity))
+            self._evict()
+
+    def _evict(self):
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def _load(self, idx):
+        frame = np.array(self._frames[idx])
+        with self._lock:
+            self._cache[idx] = frame
+            self._cache.move_to_end(idx)
+            self._evict()
+        return frame
+
+    def __getitem__(self, idx):
+        with self._lock:
+            frame = self._cache.get(idx)
+            if frame is not None:
+                self._cache.move_to_end(idx)
+                self.hits += 1
+                return frame
+            self.misses += 1
+        return self._load(idx)
+
+    def read_ahead(self, indices):
+        """Queue ``indices`` to be loaded into the window in the background."""
+        with self._lock:
+            self._pending.extend(i for i in indices if i not in self._cache)
+            if not self._pending or (self._reader and self._reader.is_alive()):
+                return
+            self._reader = threading.Thread(
+                target=self._read_pending, name="avatar-frame-readahead", daemon=True
+            )
+            self._reader.start()
+
+    def _read_pending(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._reader = None
+                    return
+                idx = self._pending.pop(0)
+                if idx in self._cache:
+                    continue
+            try:
+                self._load(idx)
+            except Exception as e:
+                logger.error(f"Frame read-ahead failed at {idx}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._cache.clear()
+
+
+class _LatentView:
+    """Sequence of [1, C, H, W] latent tensors backed by an fp16 (memory-mapped) array."""
+
+    def __init__(self, latents):
+        self._latents = latents
+
+    def __len__(self):
+        return len(self._latents)
+
+    def __getitem__(self, idx):
+        return torch.from_numpy(np.array(self._latents[idx : idx + 1]))
+
+
+class _MaskView:
+    """Sequence of single-channel blending mask crops stored in a bundle."""
+
+    def __init__(self, bundle):
+        self._bundle = bundle
+
+    def __len__(self):
+        return self._bundle.ragged_len("masks")
+
+    def __getitem__(self, idx):
+        return self._bundle.ragged("masks", idx)
 
 
 class Avatar:
     base_path = "../Streamer"
     musetalk_path = "../MuseTalk"
     active = False
+    # Frames per checkpointed preparation chunk
+    prep_chunk_size = 64
+    # Minimum number of frames kept decoded in RAM by the lazy frame source;
+    # generation grows it to a few batches worth of read-ahead
+    frame_window = 32
+    # Batches buffered between consecutive generation stages
+    pipeline_queue_size = 2
+    # Ring sizes that are a multiple of the ping-pong cycle keep each output
+    # buffer on one base frame (ROI-only restores) when they fit this budget
+    frame_ring_budget = 512 * 2**20
 
     def __init__(
         self,
@@ -61,7 +668,13 @@ class Avatar:
         compress=False,
         compress_resolution=None, 
         compress_fps=None, 
-        compress_bitrate=None
+        compress_bitrate=None,
+        prepare_workers=1,
+        prepare_batch_size=16,
+        save_frames=False,
+        progress_callback=None,
+        lazy_frames=True,
+        blend_workers=1,
     ):
         video_path = self.base_path + video_path
         self.version = version
@@ -72,11 +685,60 @@ class Avatar:
 
         self.avatar_id = avatar_id
         self.bbox_shift = bbox_shift
-        
+        # >1 enables sharded (multi-process) material preparation
+        self.prepare_workers = max(1, int(prepare_workers or 1))
+        # Crops per VAE encode / face-parsing forward pass during preparation
+        self.prepare_batch_size = max(1, int(prepare_batch_size or 1))
+        # Keep decoded frames as PNGs in full_imgs/ (debugging only)
+        self.save_frames = save_frames
+        # progress_callback(stage, fraction) receives preparation progress
+        self.progress_callback = progress_callback
+        # Read frames on demand through an LRU window instead of loading them all
+        self.lazy_frames = lazy_frames
+        self.frame_source = None
+        # Threads blending generated faces into frames (1 = inline in the blend stage)
+        self.blend_workers = max(1, int(blend_workers or 1))
+
+        # Compression is applied while frames are extracted (see _iter_source_frames)
+        self.compress = None
+        if compress:
+            if not compress_resolution or not compress_fps or not compress_bitrate:
+                raise ValueError("Compress is required but missing attribute!")
+            self.compress = {
+                "resolution": int(compress_resolution),
+                "fps": int(compress_fps),
+                "bitrate": int(compress_bitrate),
+            }
+            # Databases updated by earlier versions point at the compressed
+            # copy; the cache key and decoding always use the source video
+            if video_path.endswith(COMPRESSED_SUFFIX):
+                source_path = video_path[: -len(COMPRESSED_SUFFIX)]
+                if os.path.isfile(source_path):
+                    video_path = source_path
+
         self.video_path = video_path
+        # Seconds spent per transcoding stage (decode, scale, encode)
+        self.transcode_timings = {}
+
+        # Prepared data is content addressed: keyed by the video content and
+        # every parameter that changes the prepared material.
+        try:
+            self.video_digest = video_digest(self.video_path)
+        except OSError as e:
+            logger.warning(f"Could not hash avatar video {self.video_path}: {e}")
+            self.video_digest = "path:" + hashlib.sha256(
+                self.video_path.encode("utf-8")
+            ).hexdigest()
+        self.cache_key = avatar_cache_key(
+            self.video_digest, bbox_shift, version, extra_margin, parsing_mode, self.compress
+        )
 
         cwd = os.getcwd()
-        self.avatar_path = os.path.join(cwd, f"./results/avatars/avatar_{avatar_id}")
+        self.avatar_path = os.path.join(cwd, f"./results/avatars/{self.cache_key}")
+        # Per-avatar-id directory used before the content-addressed cache
+        self.legacy_avatar_path = os.path.join(
+            cwd, f"./results/avatars/avatar_{avatar_id}"
+        )
         self.full_imgs_path = f"{self.avatar_path}/full_imgs"
         self.coords_path = f"{self.avatar_path}/coords.pkl"
         self.latents_out_path = f"{self.avatar_path}/latents.pt"
@@ -84,123 +746,239 @@ class Avatar:
         self.mask_out_path = f"{self.avatar_path}/mask"
         self.mask_coords_path = f"{self.avatar_path}/mask_coords.pkl"
         self.avatar_info_path = f"{self.avatar_path}/avator_info.json"
-        
-        # Preprocessing video
-        if compress:
-            if not compress_resolution or not compress_fps or not compress_bitrate:
-                raise ValueError("Compress is required but missing attribute!")
-            self._preprocess_avatar_video(compress_resolution, compress_fps, compress_bitrate)
-        
+        self.bundle_path = f"{self.avatar_path}/avatar.bundle"
+        self.prep_path = f"{self.avatar_path}/.prep"
+
         self.avatar_info = {
             "avatar_id": avatar_id,
             "video_path": self.video_path,
             "bbox_shift": bbox_shift,
             "version": self.version,
+            "extra_margin": extra_margin,
+            "parsing_mode": parsing_mode,
+            "video_digest": self.video_digest,
+            "cache_key": self.cache_key,
+            "compress": self.compress,
         }
         self.preparation = preparation
-        self.idx = 0
-        
+        # Runs generating with this avatar; they share its lazy frame window
+        self._runs = set()
+        self._runs_lock = threading.Lock()
 
-    def _preprocess_avatar_video(self, target_width=480, fps=25, bitrate_kbps=500):
-        """
-        Giảm độ phân giải, fps và bitrate cho video avatar.
-
-        :param input_path: Đường dẫn video gốc.
-        :param output_path: Nơi lưu video đã nén.
-        :param target_width: Chiều rộng mong muốn (tự giữ tỷ lệ).
-        :param fps: Số khung hình mỗi giây mong muốn.
-        :param bitrate_kbps: Bitrate mục tiêu (kb/s).
-        """
-        
-        try:
-            logger.info("Preprocessing avatar video...")
-            output_path = f"{self.video_path}.compressed.mp4"
-            
-            # Đảm bảo thư mục đích tồn tại
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            cmd = [
-                "ffmpeg", "-y", "-i", self.video_path,
-                "-vf", f"scale={target_width}:-2,fps={fps}",
-                "-b:v", f"{bitrate_kbps}k",
-                "-c:v", "libx264", "-preset", "fast",
-                "-movflags", "+faststart",  # tối ưu streaming qua mạng
-                "-an",  # Bỏ track audio nếu không cần (avatar thường không cần âm thanh)
-                output_path
-            ]
-            subprocess.run(cmd, check=True)
-            self.video_path = output_path
-            self._update_avatar_status(video_path=self.video_path)
-        except Exception as e:
-            logger.error("Error")
 
     def prepare_avatar(self, fp, vae):
         try:
-            # Setup paths
-            musetalk_abs_path = os.path.abspath(str(self.musetalk_path))
-            original_cwd = os.getcwd()
-
-            # Change to MuseTalk directory for imports
-            os.chdir(musetalk_abs_path)
-            if musetalk_abs_path not in sys.path:
-                sys.path.insert(0, musetalk_abs_path)
-            
+            # MuseTalk modules were imported (relative model paths resolved)
+            # by initialize_models; only the import path is needed here
+            add_musetalk_path(self.musetalk_path)
+
             if not self.active:
-                if self.preparation:
-                    if not os.path.exists(self.avatar_path):
-                        self._create_avatar(fp, vae)
-                else:
-                    if not os.path.exists(self.avatar_path):
-                        logger.warning(
-                            f"Avatar path for {self.avatar_id} does not exist; forcing re-creation (preparation set False)."
-                        )
-                        self._create_avatar(fp, vae)
-                    else:
-                        avatar_info = self._read_avatar_info()
-                        if avatar_info is None:
-                            # Corrupted or unreadable file – rebuild
-                            logger.warning(
-                                f"Avatar info file corrupted/unreadable for {self.avatar_id}; re-creating avatar data."
-                            )
-                            self.preparation = True
-                            self._create_avatar(fp, vae)
-                        elif avatar_info.get("bbox_shift") != self.avatar_info.get("bbox_shift"):
-                            logger.warning("bbox_shift is changed, forcing re-creation.")
-                            self._create_avatar(fp, vae)
-                        else:
-                            self._load_avatar()
-                        
+                with _prepare_locks.setdefault(self.cache_key, threading.Lock()):
+                    self._prepare_or_load(fp, vae)
+
             self.preparation = False
             self.active = True
-            # Restore working directory
-            os.chdir(original_cwd)
             self._update_avatar_status(is_prepared=True)
             return True
 
         except Exception as e:
             logger.error(f"Failed to prepare avatar: {e}")
-            # Restore working directory on error
-            try:
-                os.chdir(original_cwd)
-            except:
-                pass
             return False
     
+    def _prepare_or_load(self, fp, vae):
+        if not self._is_prepared_on_disk():
+            self._adopt_legacy_dir()
+        if self.preparation:
+            if not self._is_prepared_on_disk():
+                self._create_avatar(fp, vae)
+            else:
+                self._load_avatar()
+        else:
+            if not self._is_prepared_on_disk():
+                logger.warning(
+                    f"Avatar path for {self.avatar_id} does not exist; forcing re-creation (preparation set False)."
+                )
+                self._create_avatar(fp, vae)
+            elif self._read_avatar_info() is None:
+                # Corrupted or unreadable file – rebuild
+                logger.warning(
+                    f"Avatar info file corrupted/unreadable for {self.avatar_id}; re-creating avatar data."
+                )
+                self.preparation = True
+                self._create_avatar(fp, vae)
+            else:
+                # bbox_shift and the other prep parameters are part of the
+                # cache key, so an existing directory always matches them
+                self._load_avatar()
+
+    def _adopt_legacy_dir(self):
+        """Move a matching ``avatar_{id}`` directory into the content-addressed cache."""
+        legacy_info_path = f"{self.legacy_avatar_path}/avator_info.json"
+        try:
+            with open(legacy_info_path, "r") as f:
+                legacy_info = json.load(f)
+        except Exception:
+            return
+        if not self._legacy_info_matches(legacy_info):
+            logger.info(
+                f"Legacy avatar directory {self.legacy_avatar_path} was prepared with "
+                f"other settings or another video; not adopting it"
+            )
+            return
+        if os.path.exists(self.avatar_path):
+            shutil.rmtree(self.avatar_path, ignore_errors=True)
+        os.makedirs(os.path.dirname(self.avatar_path), exist_ok=True)
+        os.replace(self.legacy_avatar_path, self.avatar_path)
+        self._write_avatar_info()
+        logger.info(
+            f"Moved legacy avatar directory {self.legacy_avatar_path} to {self.avatar_path}"
+        )
+
+    def _legacy_info_matches(self, legacy_info):
+        """
+        Whether a legacy directory holds material of this very avatar: the
+        DB id may since point at another video, or other preparation settings.
+        """
+        # Legacy directories were never compressed
+        if self.compress:
+            return False
+        legacy_video = legacy_info.get("video_path")
+        if not legacy_video or os.path.realpath(legacy_video) != os.path.realpath(
+            self.video_path
+        ):
+            return False
+        if legacy_info.get("video_digest", self.video_digest) != self.video_digest:
+            return False
+        if legacy_info.get("bbox_shift") != self.bbox_shift:
+            return False
+        # Older directories did not record the remaining settings
+        for name, value in (
+            ("version", self.version),
+            ("extra_margin", self.extra_margin),
+            ("parsing_mode", self.parsing_mode),
+        ):
+            if legacy_info.get(name, value) != value:
+                return False
+        return True
+
+    def _write_avatar_info(self):
+        """Atomic write of avatar info to avoid truncation on crash."""
+        tmp_path = f"{self.avatar_info_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.avatar_info, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.avatar_info_path)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
+
+    def memory_usage(self):
+        """
+        Bytes this loaded avatar holds: ``resident`` is process memory (frame
+        window or in-RAM frames, coordinate tables, any in-memory material),
+        ``mapped`` is bundle data read through the OS page cache.
+        """
+        resident, mapped = 0, 0
+        if self.frame_source is not None:
+            # Reserve the full window, not its current fill
+            resident += self.frame_source.capacity * self.frame_source.frame_nbytes
+        elif isinstance(getattr(self, "frame_list", None), np.ndarray) and not isinstance(
+            self.frame_list, np.memmap
+        ):
+            resident += self.frame_list.nbytes
+        for name in ("coord_list", "mask_box_list"):
+            resident += 4 * 4 * len(getattr(self, name, None) or [])
+        if isinstance(getattr(self, "blend_plan", None), np.ndarray) and not isinstance(
+            self.blend_plan, np.memmap
+        ):
+            resident += self.blend_plan.nbytes
+        if getattr(self, "bundle", None) is not None:
+            try:
+                mapped = os.path.getsize(self.bundle.path)
+            except OSError:
+                pass
+        return {"resident": int(resident), "mapped": int(mapped)}
+
+    def warm(self):
+        """
+        Pull the bundle into the page cache and fill the frame window so the
+        first generation after a switch does not wait on disk.
+        """
+        if getattr(self, "bundle", None) is None:
+            return
+        try:
+            fd = os.open(self.bundle.path, os.O_RDONLY)
+            try:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"Could not pre-read bundle of avatar {self.avatar_id}: {e}")
+        if self.frame_source is not None:
+            self.frame_source.read_ahead(
+                range(min(self.frame_source.capacity, len(self.frame_source)))
+            )
+
+    def _is_prepared_on_disk(self):
+        return os.path.exists(self.bundle_path) or os.path.exists(self.coords_path)
+
+    def _report_progress(self, stage, fraction):
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(stage, min(1.0, max(0.0, fraction)))
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {e}")
+
+    def _estimate_frame_count(self):
+        try:
+            if os.path.isfile(self.video_path):
+                cap = cv2.VideoCapture(self.video_path)
+                try:
+                    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                    src_fps = cap.get(cv2.CAP_PROP_FPS)
+                finally:
+                    cap.release()
+                if self.compress and src_fps > self.compress["fps"]:
+                    count = int(count * self.compress["fps"] / src_fps)
+                return max(1, count)
+            return max(
+                1, len([f for f in os.listdir(self.video_path) if f.split(".")[-1] == "png"])
+            )
+        except Exception:
+            return 1
+
+    def _prep_params(self):
+        params = {
+            "video_digest": self.video_digest,
+            "bbox_shift": self.bbox_shift,
+            "version": self.version,
+            "extra_margin": self.extra_margin,
+            "parsing_mode": self.parsing_mode,
+        }
+        if self.compress:
+            params["compress"] = self.compress
+        return params
+
     def _create_avatar(self, fp, vae):
+        if PrepCheckpoint.can_resume(self.prep_path, self._prep_params()):
+            logger.info(f"Resuming interrupted preparation of avatar [{self.avatar_id}]")
         # Remove any existing (possibly corrupted) directory
-        if os.path.isdir(self.avatar_path):
+        elif os.path.isdir(self.avatar_path):
             try:
                 shutil.rmtree(self.avatar_path)
             except Exception as e:
                 logger.warning(f"Could not remove existing avatar directory: {e}")
         logger.info(f"***** Creating avator: [{self.avatar_id}] with video = {self.video_path}  ******")
-        osmakedirs(
-            [
-                self.avatar_path,
-                self.full_imgs_path,
-                self.video_out_path,
-                self.mask_out_path,
-            ]
-        )
+        osmakedirs([self.avatar_path, self.video_out_path])
+        if self.save_frames:
+            osmakedirs([self.full_imgs_path])
         self._prepare_material(fp, vae)
 
     def _read_avatar_info(self):
@@ -222,34 +1000,148 @@ class Avatar:
     def _load_avatar(self):
         try:
             logger.info(f"***** Loading prepared avatar [{self.avatar_id}] *****")
-            from musetalk.utils.preprocessing import read_imgs
-
-            self.input_latent_list_cycle = torch.load(self.latents_out_path)
-            with open(self.coords_path, "rb") as f:
-                self.coord_list_cycle = pickle.load(f)
-            input_img_list = glob.glob(
-                os.path.join(self.full_imgs_path, "*.[jpJP][pnPN]*[gG]")
-            )
-            input_img_list = sorted(
-                input_img_list,
-                key=lambda x: int(os.path.splitext(os.path.basename(x))[0]),
-            )
-            self.frame_list_cycle = read_imgs(input_img_list)
-            with open(self.mask_coords_path, "rb") as f:
-                self.mask_coords_list_cycle = pickle.load(f)
-            input_mask_list = glob.glob(
-                os.path.join(self.mask_out_path, "*.[jpJP][pnPN]*[gG]")
-            )
-            input_mask_list = sorted(
-                input_mask_list,
-                key=lambda x: int(os.path.splitext(os.path.basename(x))[0]),
+            if not os.path.exists(self.bundle_path):
+                self._migrate_legacy_layout()
+            start_time = time.time()
+            self._open_bundle()
+            logger.info(
+                f"Opened avatar bundle with {len(self.frame_list_cycle)} frames in {(time.time() - start_time) * 1000:.1f}ms"
             )
-            self.mask_list_cycle = read_imgs(input_mask_list)
             self._update_avatar_status()
         except Exception as e:
             logger.error(f"Failed loading avatar...: {e}")
             raise
 
+    def _migrate_legacy_layout(self):
+        """Convert a PNG/pickle avatar directory into a bundle and drop the old files."""
+        from musetalk.utils.preprocessing import read_imgs
+
+        logger.info(f"Migrating avatar [{self.avatar_id}] to bundle format...")
+        # Legacy directories hold the materialized cycle (seq + seq[::-1]);
+        # only the forward half is kept.
+        def forward_half(seq):
+            return list(seq[: len(seq) // 2])
+
+        self.input_latent_list = forward_half(torch.load(self.latents_out_path))
+        with open(self.coords_path, "rb") as f:
+            self.coord_list = forward_half(pickle.load(f))
+        input_img_list = glob.glob(
+            os.path.join(self.full_imgs_path, "*.[jpJP][pnPN]*[gG]")
+        )
+        input_img_list = sorted(
+            input_img_list,
+            key=lambda x: int(os.path.splitext(os.path.basename(x))[0]),
+        )
+        self.frame_list = read_imgs(forward_half(input_img_list))
+        with open(self.mask_coords_path, "rb") as f:
+            self.mask_coords_list = forward_half(pickle.load(f))
+        input_mask_list = glob.glob(
+            os.path.join(self.mask_out_path, "*.[jpJP][pnPN]*[gG]")
+        )
+        input_mask_list = sorted(
+            input_mask_list,
+            key=lambda x: int(os.path.splitext(os.path.basename(x))[0]),
+        )
+        self.mask_list = read_imgs(forward_half(input_mask_list))
+        self._save_bundle()
+        self._remove_legacy_files()
+
+    def _remove_legacy_files(self):
+        for path in (self.full_imgs_path, self.mask_out_path):
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        for path in (self.coords_path, self.mask_coords_path, self.latents_out_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _save_bundle(self):
+        """
+        Write the prepared forward sequence. ``mask_list`` / ``mask_coords_list``
+        hold MuseTalk crop-box masks; only their blending ROI is stored.
+        """
+        latents = torch.cat(
+            [latent.detach().float().cpu() for latent in self.input_latent_list],
+            dim=0,
+        )
+        frame_shape = np.asarray(self.frame_list[0]).shape
+        mask_rois, mask_boxes = [], []
+        for mask, crop_box, bbox in zip(
+            self.mask_list, self.mask_coords_list, self.coord_list
+        ):
+            roi, box = mask_to_roi(mask, crop_box, bbox, frame_shape)
+            mask_rois.append(roi)
+            mask_boxes.append(box)
+        mask_data, mask_offsets, mask_shapes = pack_ragged(mask_rois)
+        write_bundle(
+            self.bundle_path,
+            {
+                "frames": self.frame_list,
+                "latents": latents.numpy().astype(np.float16),
+                "coords": np.asarray(self.coord_list, dtype=np.int32),
+                "mask_boxes": np.asarray(mask_boxes, dtype=np.int32),
+                "blend_plan": build_blend_plan(self.coord_list, mask_boxes),
+                "masks_data": mask_data,
+                "masks_offsets": mask_offsets,
+                "masks_shapes": mask_shapes,
+            },
+            meta=dict(
+                self.avatar_info,
+                cycle="pingpong",
+                mask_layout="roi",
+                blend_plan_face_size=FACE_SIZE,
+            ),
+        )
+
+    def _upgrade_bundle(self, bundle):
+        """Rewrite a bundle from an older layout (materialized cycle, crop-box masks)."""
+        logger.info(f"Upgrading avatar bundle [{self.avatar_id}] to the current layout...")
+        count = len(bundle.array("frames"))
+        latent_count = len(bundle.array("latents"))
+        mask_count = bundle.ragged_len("masks")
+        if bundle.meta.get("cycle") != "pingpong":
+            # materialized seq + seq[::-1]: keep the forward half
+            count, latent_count, mask_count = count // 2, latent_count // 2, mask_count // 2
+        self.frame_list = bundle.array("frames")[:count]
+        self.coord_list = bundle.array("coords")[:count].tolist()
+        self.input_latent_list = _latents_from_array(
+            np.asarray(bundle.array("latents")[:latent_count])
+        )
+        self.mask_list = [bundle.ragged("masks", i) for i in range(mask_count)]
+        self.mask_coords_list = bundle.array("mask_coords")[:mask_count].tolist()
+        self._save_bundle()
+
+    def _open_bundle(self):
+        bundle = open_bundle(self.bundle_path)
+        if bundle.meta.get("mask_layout") != "roi":
+            self._upgrade_bundle(bundle)
+            bundle = open_bundle(self.bundle_path)
+        self.bundle = bundle
+        if self.lazy_frames:
+            self.frame_source = LazyFrameSource(bundle.array("frames"), self.frame_window)
+            self.frame_list = self.frame_source
+        else:
+            self.frame_source = None
+            self.frame_list = np.array(bundle.array("frames"))
+        # Coordinate tables are tiny; keep them as python ints for slicing/cv2
+        self.coord_list = bundle.array("coords").tolist()
+        self.mask_box_list = bundle.array("mask_boxes").tolist()
+        if "blend_plan" in bundle:
+            self.blend_plan = bundle.array("blend_plan")
+        else:
+            # Bundles from before the plan: cheap to derive from the coords
+            self.blend_plan = build_blend_plan(self.coord_list, self.mask_box_list)
+        self.input_latent_list = _LatentView(bundle.array("latents"))
+        self.mask_roi_list = _MaskView(bundle)
+        # Crop-box masks from preparation/upgrade are superseded by the ROIs
+        self.mask_list = self.mask_coords_list = None
+
+        self.frame_list_cycle = PingPongCycle(self.frame_list)
+        self.coord_list_cycle = PingPongCycle(self.coord_list)
+        self.mask_box_list_cycle = PingPongCycle(self.mask_box_list)
+        self.blend_plan_cycle = PingPongCycle(self.blend_plan)
+        self.input_latent_list_cycle = PingPongCycle(self.input_latent_list)
+        self.mask_roi_list_cycle = PingPongCycle(self.mask_roi_list)
+
     def _update_avatar_status(self, video_path=None, is_prepared=None):
         from src.database import get_db
 
@@ -276,100 +1168,288 @@ class Avatar:
 
     def _prepare_material(self, fp, vae):
         try:
-            from musetalk.utils.preprocessing import get_landmark_and_bbox
-            from musetalk.utils.blending import get_image_prepare_material
-
             logger.info("preparing data materials ... ...")
-            # Atomic write of avatar info to avoid truncation on crash
-            tmp_path = f"{self.avatar_info_path}.tmp"
-            try:
-                with open(tmp_path, "w") as f:
-                    json.dump(self.avatar_info, f)
-                    f.flush()
-                    os.fsync(f.fileno())
-                os.replace(tmp_path, self.avatar_info_path)
-            finally:
-                if os.path.exists(tmp_path):
-                    try:
-                        os.remove(tmp_path)
-                    except Exception:
-                        pass
+            self._write_avatar_info()
 
-            if os.path.isfile(self.video_path):
-                video2imgs(self.video_path, self.full_imgs_path, ext="png")
+            checkpoint = PrepCheckpoint(
+                self.prep_path, self._prep_params(), chunk_size=self.prep_chunk_size
+            )
+            if self.prepare_workers > 1:
+                self._prepare_material_sharded(vae, checkpoint)
             else:
-                logger.info(f"copy files in {self.video_path}")
-                files = os.listdir(self.video_path)
-                files.sort()
-                files = [file for file in files if file.split(".")[-1] == "png"]
-                for filename in files:
-                    shutil.copyfile(
-                        f"{self.video_path}/{filename}",
-                        f"{self.full_imgs_path}/{filename}",
-                    )
-            input_img_list = sorted(
-                glob.glob(os.path.join(self.full_imgs_path, "*.[jpJP][pnPN]*[gG]"))
+                self._prepare_material_serial(fp, vae, checkpoint)
+
+            self._report_progress("bundle", 0.95)
+            self._collect_checkpoint(checkpoint)
+            self._save_bundle()
+            self._open_bundle()
+            checkpoint.clear()
+            self._report_progress("done", 1.0)
+        except Exception as e:
+            logger.error(f"Prepare material failed: {e}")
+            raise e
+
+    def _parsing_mode(self):
+        return self.parsing_mode if self.version == "v15" else "raw"
+
+    def _adjust_coords(self, coord_list, frame_list):
+        """Apply the v15 bottom margin to every detected bbox (in place)."""
+        for idx, (bbox, frame) in enumerate(zip(coord_list, frame_list)):
+            if bbox == COORD_PLACEHOLDER:
+                continue
+            x1, y1, x2, y2 = bbox
+            if self.version == "v15":
+                y2 = y2 + self.extra_margin
+                y2 = min(y2, frame.shape[0])
+                coord_list[idx] = [x1, y1, x2, y2]
+        return coord_list
+
+    def _encode_latents(self, coord_list, frame_list, vae):
+        input_latent_list = []
+        crops = []
+        for bbox, frame in zip(coord_list, frame_list):
+            if bbox == COORD_PLACEHOLDER:
+                continue
+            x1, y1, x2, y2 = bbox
+            crop_frame = frame[y1:y2, x1:x2]
+            crops.append(
+                cv2.resize(crop_frame, (256, 256), interpolation=cv2.INTER_LANCZOS4)
             )
+            if len(crops) >= self.prepare_batch_size:
+                input_latent_list.extend(encode_latents_batched(vae, crops))
+                crops = []
+        if crops:
+            input_latent_list.extend(encode_latents_batched(vae, crops))
+        return input_latent_list
 
-            logger.info("extracting landmarks...")
-            coord_list, frame_list = get_landmark_and_bbox(
-                input_img_list, self.bbox_shift
+    def _iter_source_frames(self, skip=0):
+        """
+        Decode stage: stream frames from the video (or PNG directory). With
+        compression enabled, frames are scaled / fps-reduced in-process and the
+        compressed video is encoded in the background as they are consumed.
+        """
+        compressed_path = None
+        if os.path.isfile(self.video_path) and self.compress:
+            compressed_path = f"{self.video_path}{COMPRESSED_SUFFIX}"
+            frames = iter_transcoded_frames(
+                self.video_path,
+                target_width=self.compress["resolution"],
+                fps=self.compress["fps"],
+                bitrate_kbps=self.compress["bitrate"],
+                output_path=compressed_path,
+                skip=skip,
+                timings=self.transcode_timings,
             )
-            input_latent_list = []
-            idx = -1
-
-            # maker if the bbox is not sufficient
-            coord_placeholder = (0.0, 0.0, 0.0, 0.0)
-            for bbox, frame in zip(coord_list, frame_list):
-                idx = idx + 1
-                if bbox == coord_placeholder:
-                    continue
-                x1, y1, x2, y2 = bbox
-                if self.version == "v15":
-                    y2 = y2 + self.extra_margin
-                    y2 = min(y2, frame.shape[0])
-                    coord_list[idx] = [x1, y1, x2, y2]
-                crop_frame = frame[y1:y2, x1:x2]
-                resized_crop_frame = cv2.resize(
-                    crop_frame, (256, 256), interpolation=cv2.INTER_LANCZOS4
-                )
-                latents = vae.get_latents_for_unet(resized_crop_frame)
-                input_latent_list.append(latents)
+        elif os.path.isfile(self.video_path):
+            frames = iter_video_frames(self.video_path, skip=skip)
+        else:
+            logger.info(f"reading frames in {self.video_path}")
+            frames = iter_image_dir(self.video_path, skip=skip)
+        for idx, frame in enumerate(frames, start=skip):
+            if self.save_frames:
+                cv2.imwrite(f"{self.full_imgs_path}/{idx:08d}.png", frame)
+            yield frame
+        if compressed_path:
+            # The database keeps the source path (the cache key hashes it);
+            # the compressed copy is recorded with the prepared data
+            self.avatar_info["compressed_video_path"] = compressed_path
+            self._write_avatar_info()
 
-            self.frame_list_cycle = frame_list + frame_list[::-1]
-            self.coord_list_cycle = coord_list + coord_list[::-1]
-            self.input_latent_list_cycle = input_latent_list + input_latent_list[::-1]
-            self.mask_coords_list_cycle = []
-            self.mask_list_cycle = []
+    def _iter_checkpointed_frames(self, checkpoint, replay=True):
+        """
+        Checkpointed decode stage. Frames already in the checkpoint are served
+        from it (when ``replay``), the rest are decoded and appended to it. The
+        frame file is synced at every chunk boundary, before the chunk is
+        handed to the next stages.
+        """
+        stored = checkpoint.frames()
+        if replay:
+            for frame in stored:
+                yield frame
+        if checkpoint.decode_done:
+            return
+        if len(stored):
+            logger.info(f"Resuming decode after {len(stored)} frames")
+        writer = None
+        try:
+            position = len(stored)
+            for frame in self._iter_source_frames(skip=len(stored)):
+                if writer is None:
+                    writer = checkpoint.open_frames_writer(frame.shape)
+                writer.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+                position += 1
+                if position % checkpoint.chunk_size == 0:
+                    checkpoint.sync(writer)
+                yield frame
+            if writer is not None:
+                checkpoint.sync(writer)
+            checkpoint.mark_decoded()
+        finally:
+            if writer is not None:
+                writer.close()
 
-            for i, frame in enumerate(tqdm(self.frame_list_cycle)):
-                cv2.imwrite(f"{self.full_imgs_path}/{str(i).zfill(8)}.png", frame)
+    def _collect_checkpoint(self, checkpoint):
+        """Merge the per-chunk stage outputs in frame order."""
+        self.frame_list = checkpoint.frames()
+        num_frames = len(self.frame_list)
+        if num_frames == 0:
+            raise ValueError(f"No frames decoded from {self.video_path}")
+        self.coord_list, self.input_latent_list = [], []
+        self.mask_list, self.mask_coords_list = [], []
+        for chunk in range(checkpoint.num_chunks(num_frames)):
+            self.coord_list.extend(
+                _coords_from_array(checkpoint.load("bbox", chunk)["coords"])
+            )
+            self.input_latent_list.extend(
+                _latents_from_array(checkpoint.load("latents", chunk)["latents"])
+            )
+            masks = checkpoint.load("masks", chunk)
+            self.mask_list.extend(
+                unpack_ragged(masks["data"], masks["offsets"], masks["shapes"])
+            )
+            self.mask_coords_list.extend(masks["crop_boxes"].tolist())
 
-                x1, y1, x2, y2 = self.coord_list_cycle[i]
-                if self.version == "v15":
-                    mode = self.parsing_mode
-                else:
-                    mode = "raw"
-                mask, crop_box = get_image_prepare_material(
-                    frame, [x1, y1, x2, y2], fp=fp, mode=mode
-                )
+    def _prepare_masks(self, coord_list, frame_list, fp):
+        mode = self._parsing_mode()
+        mask_list, mask_coords_list = [], []
+        batch_size = self.prepare_batch_size
+        for i in range(0, len(frame_list), batch_size):
+            masks, crop_boxes = prepare_masks_batched(
+                frame_list[i : i + batch_size], coord_list[i : i + batch_size], fp, mode
+            )
+            mask_list.extend(masks)
+            mask_coords_list.extend(crop_boxes)
+        return mask_list, mask_coords_list
 
-                cv2.imwrite(f"{self.mask_out_path}/{str(i).zfill(8)}.png", mask)
-                self.mask_coords_list_cycle += [crop_box]
-                self.mask_list_cycle.append(mask)
+    def _prepare_material_serial(self, fp, vae, checkpoint):
+        """
+        Generator pipeline: decoded frames flow in chunks straight through
+        landmark extraction, latent encoding and mask preparation. Each stage
+        output is checkpointed per chunk; finished chunks are skipped.
+        """
+        logger.info("extracting landmarks, latents and masks...")
+        total_chunks = checkpoint.num_chunks(self._estimate_frame_count())
+        chunks = iter_chunks(
+            self._iter_checkpointed_frames(checkpoint), checkpoint.chunk_size
+        )
+        for chunk, frames in enumerate(tqdm(chunks)):
+            self._report_progress("prepare", 0.95 * chunk / max(total_chunks, chunk + 1))
+            if checkpoint.has("masks", chunk):
+                continue
+            frames = [np.asarray(frame) for frame in frames]
+            if checkpoint.has("bbox", chunk):
+                coords = _coords_from_array(checkpoint.load("bbox", chunk)["coords"])
+            else:
+                coords = get_landmark_and_bbox_from_frames(frames, self.bbox_shift)
+                coords = self._adjust_coords(coords, frames)
+                checkpoint.save("bbox", chunk, coords=np.asarray(coords, dtype=np.int32))
+            if not checkpoint.has("latents", chunk):
+                latents = self._encode_latents(coords, frames, vae)
+                checkpoint.save("latents", chunk, latents=_latents_to_array(latents))
+            masks, crop_boxes = self._prepare_masks(coords, frames, fp)
+            checkpoint.save("masks", chunk, **_masks_to_arrays(masks, crop_boxes))
 
-            with open(self.mask_coords_path, "wb") as f:
-                pickle.dump(self.mask_coords_list_cycle, f)
+    def _prepare_material_sharded(self, vae, checkpoint):
+        """
+        Split the frame list into contiguous shards (one per checkpoint chunk)
+        and run landmark/bbox extraction and mask preparation on a process
+        pool. VAE encoding stays in this process (it owns the model/GPU) and
+        overlaps with the mask shards. Each shard result is checkpointed as it
+        completes; the merge back into frame order happens from the checkpoint.
 
-            with open(self.coords_path, "wb") as f:
-                pickle.dump(self.coord_list_cycle, f)
+        Workers read the decoded frames from the checkpoint's raw frame file.
+        """
+        estimated_frames = self._estimate_frame_count()
+        decoded = len(checkpoint.frames())
+        for _ in self._iter_checkpointed_frames(checkpoint, replay=False):
+            decoded += 1
+            if decoded % checkpoint.chunk_size == 0:
+                self._report_progress("decode", 0.2 * decoded / max(estimated_frames, decoded))
+        frames = checkpoint.frames()
+        num_frames = len(frames)
+        if num_frames == 0:
+            raise ValueError(f"No frames decoded from {self.video_path}")
+        shape = frames.shape
+        chunks = range(checkpoint.num_chunks(num_frames))
+        workers = min(self.prepare_workers, len(chunks))
+        mode = self._parsing_mode()
+        logger.info(
+            f"Sharded preparation: {num_frames} frames, {len(chunks)} shards, {workers} workers"
+        )
+        resumed = checkpoint.completed_chunks("masks", num_frames)
+        if resumed:
+            logger.info(f"Resuming preparation: {resumed}/{len(chunks)} shards already done")
 
-            torch.save(
-                self.input_latent_list_cycle, os.path.join(self.latents_out_path)
-            )
-        except Exception as e:
-            logger.error(f"Prepare material failed: {e}")
-            raise e
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_prepare_worker,
+            initargs=(os.path.abspath(str(self.musetalk_path)), self.version),
+        ) as pool:
+            # Stage 1: landmarks / bbox
+            logger.info("extracting landmarks...")
+            start_time = time.time()
+            futures = {
+                pool.submit(
+                    _landmark_shard,
+                    *checkpoint.chunk_range(chunk, num_frames),
+                    checkpoint.frames_path,
+                    shape,
+                    self.bbox_shift,
+                ): chunk
+                for chunk in chunks
+                if not checkpoint.has("bbox", chunk)
+            }
+            busy = 0.0
+            for done, future in enumerate(as_completed(futures), start=1):
+                self._report_progress("bbox", 0.2 + 0.4 * done / len(futures))
+                start, coords, elapsed = future.result()
+                coords = self._adjust_coords(coords, frames[start : start + len(coords)])
+                checkpoint.save(
+                    "bbox", futures[future], coords=np.asarray(coords, dtype=np.int32)
+                )
+                busy += elapsed
+            _log_stage_speedup("landmarks", num_frames, time.time() - start_time, busy, workers)
+
+            coord_chunks = {
+                chunk: _coords_from_array(checkpoint.load("bbox", chunk)["coords"])
+                for chunk in chunks
+            }
+
+            # Stage 2: masks on the pool while latents are encoded here
+            start_time = time.time()
+            futures = {
+                pool.submit(
+                    _mask_shard,
+                    *checkpoint.chunk_range(chunk, num_frames),
+                    checkpoint.frames_path,
+                    shape,
+                    coord_chunks[chunk],
+                    mode,
+                    self.prepare_batch_size,
+                ): chunk
+                for chunk in chunks
+                if not checkpoint.has("masks", chunk)
+            }
+            for chunk in chunks:
+                if checkpoint.has("latents", chunk):
+                    continue
+                start, stop = checkpoint.chunk_range(chunk, num_frames)
+                latents = self._encode_latents(
+                    coord_chunks[chunk], [np.asarray(f) for f in frames[start:stop]], vae
+                )
+                checkpoint.save("latents", chunk, latents=_latents_to_array(latents))
+
+            busy = 0.0
+            for done, future in enumerate(as_completed(futures), start=1):
+                self._report_progress("masks", 0.6 + 0.35 * done / len(futures))
+                _, masks, crop_boxes, elapsed = future.result()
+                checkpoint.save(
+                    "masks", futures[future], **_masks_to_arrays(masks, crop_boxes)
+                )
+                busy += elapsed
+            _log_stage_speedup("masks", num_frames, time.time() - start_time, busy, workers)
 
     @torch.no_grad()
     def inference(
@@ -386,23 +1466,86 @@ class Avatar:
         audio_processor,
         weight_dtype,
         device,
+        feature_cache=None,
+        render_cache=None,
+        render_tag=None,
+        batch_tuner=None,
+        profile=None,
+        scheduler=None,
+        session=None,
+        run=None,
     ):
+        """
+        Generate the frames of ``audio_path`` into ``video_queue``. Returns the
+        GenerationRun (``run`` or a new one) holding the run's frame index,
+        time to first frame and pipeline metrics.
+        """
+        if run is None:
+            run = GenerationRun(session, self.avatar_id)
+        recorder = None
         try:
             logger.info("Start inference ...")
-            ############################################## extract audio feature ##############################################
             start_time = time.time()
-            whisper_chunks = self._extract_audio_feature(
-                audio_path, audio_processor, whisper, weight_dtype, fps, device
-            )
+            audio_digest = None
+            if feature_cache is not None or render_cache is not None:
+                try:
+                    audio_digest = video_digest(audio_path)
+                except OSError as e:
+                    logger.warning(f"Could not hash audio {audio_path}: {e}")
 
-            if whisper_chunks is None or len(whisper_chunks) == 0:
-                raise ValueError("Failed to extract audio features")
+            ############################################## rendered segment cache ##############################################
+            if render_cache is not None and audio_digest:
+                # Generation always starts the avatar cycle at index 0
+                segment_key = render_cache.key(
+                    self.cache_key, audio_digest, fps, start_index=0, render_tag=render_tag
+                )
+                segment = render_cache.open(segment_key)
+                if segment is not None:
+                    logger.info(f"Replaying cached render of {audio_path}")
+                    replay_segment(segment, video_queue)
+                    return run
+                recorder = render_cache.recorder(segment_key)
 
-            logger.info(
-                f"processing audio:{audio_path} costs {(time.time() - start_time) * 1000}ms"
-            )
+            ############################################## extract audio feature ##############################################
+            cache_key = None
+            if feature_cache is not None and audio_digest:
+                cache_key = feature_cache.key(
+                    audio_digest,
+                    fps,
+                    self.audio_padding_length_left,
+                    self.audio_padding_length_right,
+                )
+            cached = feature_cache.get(cache_key) if cache_key else None
+
+            if cached is not None:
+                logger.info(f"Whisper features of {audio_path} served from cache")
+                video_num = len(cached)
+                whisper_chunks = iter_cached_chunks(cached, weight_dtype)
+            else:
+                result = self._extract_audio_feature(audio_path, audio_processor, weight_dtype)
+                if result is None:
+                    raise ValueError("Failed to extract audio features")
+                whisper_input_features, librosa_length = result
+                video_num = whisper_frame_count(librosa_length, fps)
+                if video_num <= 0:
+                    raise ValueError("Failed to extract audio features")
+
+                # Whisper windows are encoded ahead of the UNet while generation
+                # streams; the first frames only wait for the first window.
+                chunk_blocks = iter_whisper_chunks(
+                    whisper_input_features,
+                    librosa_length,
+                    whisper,
+                    device,
+                    weight_dtype,
+                    fps=fps,
+                    audio_padding_length_left=self.audio_padding_length_left,
+                    audio_padding_length_right=self.audio_padding_length_right,
+                )
+                if cache_key:
+                    chunk_blocks = feature_cache.record(cache_key, chunk_blocks, video_num)
+                whisper_chunks = iter_frames(prefetch(chunk_blocks))
             ############################################## inference batch by batch ##############################################
-            video_num = len(whisper_chunks)
             self._generate(
                 video_queue,
                 unet,
@@ -413,46 +1556,46 @@ class Avatar:
                 whisper_chunks,
                 batch_size,
                 device,
+                started_at=start_time,
+                recorder=recorder,
+                batch_tuner=batch_tuner,
+                profile=profile,
+                scheduler=scheduler,
+                session=session,
+                run=run,
             )
+            if recorder is not None:
+                if len(recorder) == video_num:
+                    recorder.commit({"audio_path": audio_path, "fps": fps})
+                else:
+                    recorder.abort()
 
             logger.info(
                 "Total process time of {} frames = {}s".format(
                     video_num, time.time() - start_time
                 )
             )
+            return run
         except Exception as e:
             logger.error(f"Error in inference: {e}")
+            if recorder is not None:
+                recorder.abort()
             raise  # Re-raise the exception to propagate it
 
-    def _extract_audio_feature(
-        self, audio_path, audio_processor, whisper, weight_dtype, fps, device
-    ):
+    def _extract_audio_feature(self, audio_path, audio_processor, weight_dtype):
+        """Load the audio and compute its Whisper input features (log-mel windows)."""
         try:
             logger.info("Creating audio features...")
             logger.info(f"Audio path: {audio_path}")
             logger.info(f"Audio file exists: {os.path.exists(audio_path)}")
 
-            # Extract audio features
             result = audio_processor.get_audio_feature(
                 audio_path, weight_dtype=weight_dtype
             )
 
             if result is None:
                 logger.error(f"Audio processor returned None for file: {audio_path}")
-                return None
-
-            whisper_input_features, librosa_length = result
-            whisper_chunks = audio_processor.get_whisper_chunk(
-                whisper_input_features,
-                device,
-                weight_dtype,
-                whisper,
-                librosa_length,
-                fps=fps,
-                audio_padding_length_left=self.audio_padding_length_left,
-                audio_padding_length_right=self.audio_padding_length_right,
-            )
-            return whisper_chunks
+            return result
         except Exception as e:
             logger.error(f"Error creating audio features: {e}")
             return None
@@ -468,94 +1611,255 @@ class Avatar:
         whisper_chunks,
         batch_size,
         device,
+        started_at=None,
+        recorder=None,
+        batch_tuner=None,
+        profile=None,
+        scheduler=None,
+        session=None,
+        run=None,
     ):
+        """
+        Staged generation: features -> UNet -> VAE decode -> blend -> output,
+        each on its own thread with bounded queues between them. With a
+        ``batch_tuner`` the batch size follows it and it is fed the measured
+        UNet+VAE time of every batch. ``profile`` (InferenceProfile) sets the
+        grad mode and the latent memory format. With a ``scheduler``
+        (InferenceScheduler) the UNet/VAE passes are shared with other
+        sessions: batches are submitted under ``session`` and collected in order.
+        Progress and metrics go to ``run`` (GenerationRun).
+        """
+        if run is None:
+            run = GenerationRun(session, self.avatar_id)
+        with self._runs_lock:
+            self._runs.add(run)
         try:
-            # Setup paths
-            musetalk_abs_path = os.path.abspath(str(self.musetalk_path))
-            original_cwd = os.getcwd()
-
-            # Change to MuseTalk directory for imports
-            os.chdir(musetalk_abs_path)
-            if musetalk_abs_path not in sys.path:
-                sys.path.insert(0, musetalk_abs_path)
-
-            from musetalk.utils.utils import datagen
-
-            res_frame_queue = queue.Queue()
-            self.idx = 0
-            # Create a sub-thread and start it
-            process_thread = threading.Thread(
-                target=self._process_frames,
-                args=(video_queue, res_frame_queue, video_num),
-            )
-            process_thread.start()
+            add_musetalk_path(self.musetalk_path)
 
-            gen = datagen(whisper_chunks, self.input_latent_list_cycle, batch_size)
+            # Buffers follow the batches actually in flight: with a tuner they
+            # are resized when its pick changes, not sized for its largest size
+            if batch_tuner is not None:
+                batch_size = batch_tuner.current()
+            in_flight = self.pipeline_queue_size + 3
+            window_batches = deque([batch_size], maxlen=in_flight)
+            self._fit_frame_window(run, batch_size)
+            next_batch = [0]
+            # Stage threads each enter the grad mode (it is thread-local)
+            grad_mode = profile.context if profile is not None else torch.no_grad
 
-            for _, (whisper_batch, latent_batch) in enumerate(
-                tqdm(gen, total=int(np.ceil(float(video_num) / batch_size)))
-            ):
-                audio_feature_batch = pe(whisper_batch.to(device))
-                latent_batch = latent_batch.to(device=device, dtype=unet.model.dtype)
+            def prepare_features(batch):
+                whisper_batch, latent_batch = batch
+                start = next_batch[0]
+                next_batch[0] += len(latent_batch)
+                if self.frame_source is not None:
+                    window_batches.append(len(latent_batch))
+                    self._fit_frame_window(run, max(window_batches))
+                    # Frames for this batch load while the UNet/VAE run
+                    self.frame_source.read_ahead(
+                        cycle_position(j, len(self.frame_source))
+                        for j in range(start, start + len(latent_batch))
+                    )
+                with grad_mode():
+                    audio_feature_batch = pe(whisper_batch.to(device))
+                if profile is not None:
+                    latent_batch = profile.prepare_input(latent_batch)
+                else:
+                    latent_batch = latent_batch.to(device=device, dtype=unet.model.dtype)
+                return start, audio_feature_batch, latent_batch
 
-                pred_latents = unet.model(
-                    latent_batch, timesteps, encoder_hidden_states=audio_feature_batch
-                ).sample
+            def run_unet(item):
+                start, audio_feature_batch, latent_batch = item
+                began = time.time()
+                with grad_mode():
+                    pred_latents = unet.model(
+                        latent_batch, timesteps, encoder_hidden_states=audio_feature_batch
+                    ).sample
                 pred_latents = pred_latents.to(device=device, dtype=vae.vae.dtype)
-                recon = vae.decode_latents(pred_latents)
-                for res_frame in recon:
-                    res_frame_queue.put(res_frame)
-            # Close the queue and sub-thread after all tasks are completed
-            process_thread.join()
-            os.chdir(original_cwd)
-        except Exception as e:
-            try:
-                os.chdir(original_cwd)
-            except:
-                pass
-            logger.error(f"Error in _generate: {e}")
-            raise  # Re-raise to propagate error
+                return start, pred_latents, time.time() - began
 
-    def _process_frames(self, video_queue, res_frame_queue, video_len):
-        try:
-            while True:
-                from musetalk.utils.blending import get_image_blending
+            def decode(item):
+                start, pred_latents, unet_seconds = item
+                began = time.time()
+                with grad_mode():
+                    recon = vae.decode_latents(pred_latents)
+                if batch_tuner is not None:
+                    batch_tuner.observe(len(recon), unet_seconds + time.time() - began)
+                return start, recon
 
-                if self.idx >= video_len - 1:
-                    break
-                try:
-                    res_frame = res_frame_queue.get(block=True, timeout=1)
-                except queue.Empty:
-                    continue
+            def submit(item):
+                start, audio_feature_batch, latent_batch = item
+                return start, scheduler.submit(session, latent_batch, audio_feature_batch)
+
+            def collect(item):
+                start, future = item
+                recon, pass_seconds = future.result()
+                if batch_tuner is not None:
+                    # One batch per session per pass: the session's rate is batch / pass time
+                    batch_tuner.observe(len(recon), pass_seconds)
+                return start, recon
 
-                bbox = self.coord_list_cycle[self.idx % (len(self.coord_list_cycle))]
-                ori_frame = copy.deepcopy(
-                    self.frame_list_cycle[self.idx % (len(self.frame_list_cycle))]
+            rings = [self._make_frame_ring(video_queue, batch_size)]
+            ring_batches = deque([batch_size], maxlen=in_flight)
+            ring_batch = [batch_size]
+            blend_pool = None
+            if self.blend_workers > 1:
+                blend_pool = ThreadPoolExecutor(
+                    max_workers=self.blend_workers, thread_name_prefix="avatar-blend"
                 )
-                x1, y1, x2, y2 = bbox
-                try:
-                    res_frame = cv2.resize(
-                        res_frame.astype(np.uint8), (x2 - x1, y2 - y1)
+
+            def blend(item):
+                start, recon = item
+                count = max(0, min(len(recon), video_num - start))
+                ring_batches.append(len(recon))
+                if max(ring_batches) != ring_batch[0]:
+                    # A fresh ring: buffers of the old one still queued downstream
+                    # are never written again, so no in-flight frame is overwritten
+                    ring_batch[0] = max(ring_batches)
+                    rings.append(self._make_frame_ring(video_queue, ring_batch[0]))
+                ring = rings[-1]
+                if blend_pool is None:
+                    return [self._blend_batch(start, recon[:count], ring)]
+                # Sub-batches finish out of order; output waits on them in index order
+                step = -(-count // self.blend_workers) if count else 1
+                return [
+                    blend_pool.submit(
+                        self._blend_batch, start + k, recon[k : k + step], ring
                     )
-                except:
-                    continue
-                mask = self.mask_list_cycle[self.idx % (len(self.mask_list_cycle))]
-                mask_crop_box = self.mask_coords_list_cycle[
-                    self.idx % (len(self.mask_coords_list_cycle))
+                    for k in range(0, count, step)
                 ]
-                combine_frame = get_image_blending(
-                    ori_frame, res_frame, bbox, mask, mask_crop_box
-                )
 
-                try:
-                    video_queue.put(
-                        (self.idx, combine_frame), timeout=0.1
-                    )
-                except:
-                    # Queue full, drop frame
-                    pass
+            started_at = started_at or time.time()
 
-                self.idx = self.idx + 1
-            self.idx = 0
+            def output(batches):
+                for batch in batches:
+                    if blend_pool is not None:
+                        batch = batch.result()
+                    for idx, combine_frame in batch:
+                        if recorder is not None:
+                            # Encoded before the ring buffer can be reused
+                            recorder.add(combine_frame)
+                        if run.time_to_first_frame is None:
+                            run.time_to_first_frame = time.time() - started_at
+                            logger.info(
+                                f"Time to first frame: {run.time_to_first_frame * 1000:.0f}ms"
+                            )
+                        try:
+                            video_queue.put((idx, combine_frame), timeout=0.1)
+                        except:
+                            # Queue full, drop frame
+                            pass
+                        run.frame_index = idx + 1
+
+            pipeline = GenerationPipeline(
+                [
+                    ("features", prepare_features),
+                    ("unet", run_unet) if scheduler is None else ("submit", submit),
+                    ("vae", decode) if scheduler is None else ("scheduled", collect),
+                    ("blend", blend),
+                    ("output", output),
+                ],
+                queue_size=self.pipeline_queue_size,
+            )
+            gen = iter_batches(
+                whisper_chunks,
+                self.input_latent_list_cycle,
+                batch_tuner.current if batch_tuner is not None else batch_size,
+            )
+            first_batch = batch_tuner.current() if batch_tuner is not None else batch_size
+            try:
+                pipeline.run(tqdm(gen, total=int(np.ceil(float(video_num) / first_batch))))
+            finally:
+                if blend_pool is not None:
+                    blend_pool.shutdown(wait=True, cancel_futures=True)
+                metrics = pipeline.metrics_dict()
+                metrics["time_to_first_frame"] = run.time_to_first_frame
+                used_rings = [ring for ring in rings if ring is not None]
+                if used_rings:
+                    metrics["frame_ring"] = {
+                        "size": used_rings[-1].size,
+                        "reallocations": len(rings) - 1,
+                        "roi_restores": sum(ring.roi_restores for ring in used_rings),
+                        "full_copies": sum(ring.full_copies for ring in used_rings),
+                    }
+                run.metrics = metrics
+                if scheduler is not None:
+                    scheduler.release(session)
         except Exception as e:
-            raise RuntimeError(f"Error process_frames: {e}")
+            logger.error(f"Error in _generate: {e}")
+            raise  # Re-raise to propagate error
+        finally:
+            with self._runs_lock:
+                self._runs.discard(run)
+            self._resize_frame_window()
+
+    def _fit_frame_window(self, run, batch_size):
+        """Frame window covering ``run``'s batch being blended plus the ones in flight."""
+        if self.frame_source is None:
+            return
+        run.window = max(self.frame_window, (self.pipeline_queue_size + 2) * batch_size)
+        self._resize_frame_window()
+
+    def _resize_frame_window(self):
+        """Size the shared frame window for the most demanding run on this avatar."""
+        if self.frame_source is None:
+            return
+        with self._runs_lock:
+            capacity = max([self.frame_window] + [run.window for run in self._runs])
+            if capacity != self.frame_source.capacity:
+                self.frame_source.resize(capacity)
+
+    def _make_frame_ring(self, video_queue, batch_size):
+        """
+        Output buffer ring large enough for every frame that can still be
+        referenced downstream (the bounded video queue plus frames in flight),
+        or None when the video queue is unbounded.
+        """
+        maxsize = getattr(video_queue, "maxsize", 0)
+        if not maxsize or maxsize <= 0:
+            return None
+        size = maxsize + (self.pipeline_queue_size + 3) * batch_size + self.blend_workers + 2
+        cycle = len(self.frame_list_cycle)
+        frame_bytes = np.asarray(self.frame_list_cycle[0]).nbytes
+        aligned = -(-size // cycle) * cycle
+        if aligned * frame_bytes <= self.frame_ring_budget:
+            size = aligned
+        return FrameRing(size)
+
+    def _blend_batch(self, start, recon, ring=None):
+        """
+        Paste a batch of generated faces into their avatar frames (ping-pong
+        indexes ``start``...) following the precomputed blending plan: one
+        affine resample of the face ROI, then the batched alpha composite.
+        Returns [(idx, frame)].
+        """
+        outputs, targets, faces, masks, boxes = [], [], [], [], []
+        for idx, res_frame in enumerate(recon, start=start):
+            # The *_cycle views wrap indexes themselves (ping-pong order)
+            mask_box = self.mask_box_list_cycle[idx]
+            base_frame = self.frame_list_cycle[idx]
+            if ring is not None:
+                # Reused buffer: only its stale ROI (or the whole frame) is copied
+                ori_frame = ring.compose(
+                    idx, cycle_position(idx, len(self.frame_list)), base_frame, mask_box
+                )
+            else:
+                ori_frame = copy.deepcopy(base_frame)
+            outputs.append((idx, ori_frame))
+            mx1, my1, mx2, my2 = mask_box
+            if mx2 <= mx1 or my2 <= my1:
+                # Degenerate bbox: keep the original frame so the sequence stays in step
+                continue
+            faces.append(
+                cv2.warpAffine(
+                    np.ascontiguousarray(res_frame, dtype=np.uint8),
+                    np.asarray(self.blend_plan_cycle[idx]),
+                    (mx2 - mx1, my2 - my1),
+                    flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                    borderMode=cv2.BORDER_REPLICATE,
+                )
+            )
+            targets.append(ori_frame)
+            masks.append(self.mask_roi_list_cycle[idx])
+            boxes.append(mask_box)
+        blend_rois_batch(targets, faces, masks, boxes)
+        return outputs
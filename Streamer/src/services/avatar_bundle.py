@@ -0,0 +1,158 @@
+import os
+import json
+import struct
+import numpy as np
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+BUNDLE_MAGIC = b"VSAVBND1"
+BUNDLE_VERSION = 1
+# Sections are page aligned so each array can be memory-mapped independently
+_ALIGN = 4096
+
+
+def _align(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def pack_ragged(arrays):
+    """
+    Pack a list of 2D uint8 arrays with different shapes into one flat buffer.
+
+    Returns (data, offsets, shapes) where ``offsets`` has len(arrays) + 1 entries.
+    """
+    shapes = np.zeros((len(arrays), 2), dtype=np.int32)
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    for i, arr in enumerate(arrays):
+        shapes[i] = arr.shape[:2]
+        offsets[i + 1] = offsets[i] + arr.shape[0] * arr.shape[1]
+    data = np.empty(int(offsets[-1]), dtype=np.uint8)
+    for i, arr in enumerate(arrays):
+        data[offsets[i] : offsets[i + 1]] = np.ascontiguousarray(arr, dtype=np.uint8).ravel()
+    return data, offsets, shapes
+
+
+def unpack_ragged(data, offsets, shapes):
+    """Inverse of ``pack_ragged``: list of 2D views into ``data``."""
+    return [
+        data[offsets[i] : offsets[i + 1]].reshape(int(shapes[i][0]), int(shapes[i][1]))
+        for i in range(len(shapes))
+    ]
+
+
+def write_bundle(path, arrays, meta=None):
+    """
+    Write arrays into a single bundle file (atomically).
+
+    ``arrays`` maps name -> ndarray, or name -> list of equally shaped ndarrays
+    which is written row by row so the caller never has to stack it in memory.
+    """
+    layout = {}
+    specs = []
+    for name, value in arrays.items():
+        if isinstance(value, np.ndarray):
+            dtype, shape = value.dtype, value.shape
+        else:
+            if len(value) == 0:
+                raise ValueError(f"Bundle array '{name}' is empty")
+            first = np.asarray(value[0])
+            dtype, shape = first.dtype, (len(value),) + first.shape
+        specs.append((name, value, np.dtype(dtype), tuple(int(d) for d in shape)))
+
+    # Header size depends on the offsets, so reserve a generous first page
+    header_reserve = _ALIGN
+    while True:
+        offset = header_reserve
+        for name, _, dtype, shape in specs:
+            layout[name] = {"dtype": dtype.str, "shape": list(shape), "offset": offset}
+            offset = _align(offset + int(np.prod(shape)) * dtype.itemsize)
+        header = json.dumps(
+            {"version": BUNDLE_VERSION, "arrays": layout, "meta": meta or {}}
+        ).encode("utf-8")
+        if len(BUNDLE_MAGIC) + 8 + len(header) <= header_reserve:
+            break
+        header_reserve = _align(len(BUNDLE_MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(BUNDLE_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, value, dtype, shape in specs:
+                f.seek(layout[name]["offset"])
+                if isinstance(value, np.ndarray):
+                    # Blockwise, so memory-mapped inputs are never fully loaded
+                    for start in range(0, max(len(value), 1), 256):
+                        block = value[start : start + 256]
+                        f.write(np.ascontiguousarray(block, dtype=dtype).tobytes())
+                else:
+                    for row in value:
+                        f.write(np.ascontiguousarray(row, dtype=dtype).tobytes())
+            f.truncate(offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except Exception:
+                pass
+
+
+class AvatarBundle:
+    """Read-only, memory-mapped view over a bundle file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic = f.read(len(BUNDLE_MAGIC))
+            if magic != BUNDLE_MAGIC:
+                raise ValueError(f"Not an avatar bundle: {path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        if header.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {header.get('version')}")
+        self.meta = header.get("meta", {})
+        self._layout = header["arrays"]
+        self._arrays = {}
+
+    def __contains__(self, name):
+        return name in self._layout
+
+    def array(self, name):
+        """Memory-mapped array; pages are only read when touched."""
+        if name not in self._arrays:
+            spec = self._layout[name]
+            self._arrays[name] = np.memmap(
+                self.path,
+                dtype=np.dtype(spec["dtype"]),
+                mode="r",
+                offset=spec["offset"],
+                shape=tuple(spec["shape"]),
+            )
+        return self._arrays[name]
+
+    def ragged(self, name, index):
+        """Item ``index`` of a ragged array packed with ``pack_ragged``."""
+        offsets = self.array(f"{name}_offsets")
+        h, w = self.array(f"{name}_shapes")[index]
+        start = int(offsets[index])
+        return self.array(f"{name}_data")[start : start + int(h) * int(w)].reshape(
+            int(h), int(w)
+        )
+
+    def ragged_len(self, name):
+        return len(self.array(f"{name}_shapes"))
+
+
+def open_bundle(path):
+    return AvatarBundle(path)
@@ -0,0 +1,151 @@
+import os
+import json
+import shutil
+import numpy as np
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+class PrepCheckpoint:
+    """
+    On-disk progress of an avatar preparation run.
+
+    Decoded frames are appended to one raw uint8 file; every other stage
+    (bbox, latents, masks) stores one ``.npz`` per chunk of frames. Each chunk
+    file is written atomically, so its presence means the chunk is done and a
+    restarted run continues from the first missing chunk.
+    """
+
+    STAGES = ("bbox", "latents", "masks")
+
+    def __init__(self, path, params, chunk_size=64):
+        self.path = path
+        self.state_path = os.path.join(path, "state.json")
+        self.frames_path = os.path.join(path, "frames.raw")
+        self.params = params
+        self.state = self._read_state()
+        if self.state is None or self.state.get("params") != params:
+            if self.state is not None:
+                logger.info("Preparation parameters changed, discarding checkpoint")
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+            self.state = {
+                "params": params,
+                "chunk_size": chunk_size,
+                "frame_shape": None,
+                "decode_done": False,
+            }
+            self._write_state()
+        self.chunk_size = self.state["chunk_size"]
+
+    @staticmethod
+    def can_resume(path, params):
+        try:
+            with open(os.path.join(path, "state.json"), "r") as f:
+                return json.load(f).get("params") == params
+        except Exception:
+            return False
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Unreadable preparation checkpoint state: {e}")
+            return None
+
+    def _write_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    # ---- decode stage ----
+    @property
+    def decode_done(self):
+        return self.state["decode_done"]
+
+    def _frame_bytes(self):
+        return int(np.prod(self.state["frame_shape"]))
+
+    def num_frames(self):
+        """Number of complete frames on disk (a torn trailing frame is dropped)."""
+        if not self.state["frame_shape"] or not os.path.exists(self.frames_path):
+            return 0
+        count = os.path.getsize(self.frames_path) // self._frame_bytes()
+        if os.path.getsize(self.frames_path) != count * self._frame_bytes():
+            with open(self.frames_path, "r+b") as f:
+                f.truncate(count * self._frame_bytes())
+        return count
+
+    def open_frames_writer(self, frame_shape):
+        if self.state["frame_shape"] is None:
+            self.state["frame_shape"] = list(frame_shape)
+            self._write_state()
+        elif tuple(self.state["frame_shape"]) != tuple(frame_shape):
+            raise ValueError(
+                f"Frame shape {frame_shape} does not match checkpoint {self.state['frame_shape']}"
+            )
+        self.num_frames()  # drop a torn trailing frame before appending
+        return open(self.frames_path, "ab")
+
+    @staticmethod
+    def sync(writer):
+        writer.flush()
+        os.fsync(writer.fileno())
+
+    def mark_decoded(self):
+        self.state["decode_done"] = True
+        self._write_state()
+
+    def frames(self):
+        """Memory-mapped (N, H, W, 3) view of the decoded frames."""
+        count = self.num_frames()
+        if count == 0:
+            return np.zeros((0, 0, 0, 3), dtype=np.uint8)
+        return np.memmap(
+            self.frames_path,
+            dtype=np.uint8,
+            mode="r",
+            shape=(count,) + tuple(self.state["frame_shape"]),
+        )
+
+    # ---- chunked stages ----
+    def num_chunks(self, num_frames):
+        return (num_frames + self.chunk_size - 1) // self.chunk_size
+
+    def chunk_range(self, chunk, num_frames):
+        start = chunk * self.chunk_size
+        return start, min(start + self.chunk_size, num_frames)
+
+    def _chunk_path(self, stage, chunk):
+        return os.path.join(self.path, f"{stage}_{chunk:06d}.npz")
+
+    def has(self, stage, chunk):
+        return os.path.exists(self._chunk_path(stage, chunk))
+
+    def save(self, stage, chunk, **arrays):
+        path = self._chunk_path(stage, chunk)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def load(self, stage, chunk):
+        with np.load(self._chunk_path(stage, chunk)) as data:
+            return {name: data[name] for name in data.files}
+
+    def completed_chunks(self, stage, num_frames):
+        return sum(self.has(stage, c) for c in range(self.num_chunks(num_frames)))
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
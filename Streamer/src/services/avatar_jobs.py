@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def send_job_progress(job):
+    """Push a job snapshot to websocket clients (never raises)."""
+    # Imported here: src.api imports this package, so a module-level import is circular
+    from ..api._manager import connection_manager
+
+    try:
+        target_loop = getattr(connection_manager, "loop", None)
+        if not target_loop or getattr(target_loop, "is_closed", lambda: True)():
+            return
+        asyncio.run_coroutine_threadsafe(
+            connection_manager.broadcast(
+                json.dumps(
+                    {"type": "avatar_prepare_progress", "job": job.to_dict()},
+                    default=str,
+                )
+            ),
+            target_loop,
+        )
+    except Exception as e:
+        logger.error(f"Error while sending avatar job progress through websocket: {e}")
+
+
+class AvatarPreparationJob:
+    """State of one background avatar preparation."""
+
+    def __init__(self, avatar_id, video_path, preparation=True):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.avatar_id = avatar_id
+        self.video_path = video_path
+        self.preparation = preparation
+        self.status = "queued"  # queued, running, done, failed
+        self.stage = None
+        self.progress = 0.0  # percent
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def is_active(self):
+        return self.status in ("queued", "running")
+
+    @property
+    def eta_seconds(self):
+        """Linear extrapolation of the elapsed time over the remaining progress."""
+        if self.status != "running" or not self.started_at or self.progress <= 0:
+            return None
+        elapsed = (datetime.now() - self.started_at).total_seconds()
+        return max(0.0, elapsed * (100.0 - self.progress) / self.progress)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "avatar_id": self.avatar_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 1),
+            "eta_seconds": self.eta_seconds,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class AvatarJobRunner:
+    """
+    Runs avatar preparation off the event loop on a bounded worker pool.
+    At most one active job exists per avatar; resubmitting returns it.
+    """
+
+    # Finished jobs kept around for the status API
+    max_history = 100
+
+    def __init__(self, max_concurrency=None):
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("AVATAR_PREPARE_CONCURRENCY", "1")
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="avatar-prepare"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, avatar_id, video_path, preparation=True) -> AvatarPreparationJob:
+        with self._lock:
+            active = self._latest_job(avatar_id)
+            if active and active.is_active:
+                logger.info(f"Avatar {avatar_id} already has job {active.job_id}")
+                return active
+            job = AvatarPreparationJob(avatar_id, video_path, preparation)
+            self._jobs[job.job_id] = job
+            self._trim_history()
+        logger.info(f"Queued preparation job {job.job_id} for avatar {avatar_id}")
+        send_job_progress(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get_job(self, job_id):
+        return self._jobs.get(job_id)
+
+    def get_avatar_job(self, avatar_id):
+        with self._lock:
+            return self._latest_job(avatar_id)
+
+    def list_jobs(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def _latest_job(self, avatar_id):
+        jobs = [j for j in self._jobs.values() if str(j.avatar_id) == str(avatar_id)]
+        return max(jobs, key=lambda j: j.created_at) if jobs else None
+
+    def _trim_history(self):
+        finished = sorted(
+            (j for j in self._jobs.values() if not j.is_active),
+            key=lambda j: j.created_at,
+        )
+        for job in finished[: max(0, len(finished) - self.max_history)]:
+            self._jobs.pop(job.job_id, None)
+
+    def _run(self, job):
+        from .musetalk import get_musetalk_realtime_service
+
+        job.status = "running"
+        job.started_at = datetime.now()
+        send_job_progress(job)
+        last_push = [0.0]
+
+        def on_progress(stage, fraction):
+            job.stage = stage
+            job.progress = min(99.9, max(job.progress, fraction * 100.0))
+            # Throttle websocket pushes to ~2/s
+            if time.time() - last_push[0] >= 0.5:
+                last_push[0] = time.time()
+                send_job_progress(job)
+
+        musetalk = get_musetalk_realtime_service()
+        try:
+            success = musetalk.prepare_avatar(
+                job.avatar_id,
+                job.video_path,
+                job.preparation,
+                progress_callback=on_progress,
+                activate=False,
+            )
+            if not success:
+                raise RuntimeError("Avatar preparation failed")
+            job.status = "done"
+            job.stage = "done"
+            job.progress = 100.0
+            logger.info(f"Preparation job {job.job_id} finished")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Preparation job {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now()
+            send_job_progress(job)
+
+
+#######################################
+avatar_job_runner = AvatarJobRunner()
@@ -0,0 +1,158 @@
+import time
+import queue
+import threading
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+# End-of-stream marker passed down the stage queues
+_END = object()
+
+
+class StageMetrics:
+    """Counters of one pipeline stage."""
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # waiting for room in the next queue
+        self._occupancy_sum = 0
+        self._samples = 0
+
+    def sample(self, qsize):
+        self._occupancy_sum += qsize
+        self._samples += 1
+
+    @property
+    def mean_occupancy(self):
+        """Average fill of the stage's input queue (0 = starved, 1 = backed up)."""
+        if not self._samples or not self.capacity:
+            return 0.0
+        return self._occupancy_sum / self._samples / self.capacity
+
+    def to_dict(self):
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "blocked_seconds": round(self.blocked_seconds, 4),
+            "mean_occupancy": round(self.mean_occupancy, 3),
+        }
+
+
+class GenerationPipeline:
+    """
+    Runs ``stages`` (list of ``(name, fn)``) each on its own thread, connected
+    by bounded queues of ``queue_size`` items. The first stage consumes the
+    source iterable; every other stage consumes what the previous one
+    returned. A stage returning None passes nothing on.
+
+    The bounded queues give backpressure: when a late stage falls behind, the
+    earlier ones block instead of piling batches up in memory. The first
+    exception raised by a stage stops the source and is re-raised by ``run``.
+    """
+
+    def __init__(self, stages, queue_size=2):
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.metrics = [StageMetrics(name, self.queue_size) for name, _ in stages]
+        self.wall_seconds = 0.0
+        self._error = None
+        self._stop = threading.Event()
+
+    def _fail(self, name, e):
+        if self._error is None:
+            self._error = e
+            logger.error(f"Pipeline stage '{name}' failed: {e}")
+        self._stop.set()
+
+    def _put(self, q, item, metrics):
+        if q is None or item is None:
+            return
+        start = time.time()
+        q.put(item)
+        metrics.blocked_seconds += time.time() - start
+
+    def _run_source(self, source, fn, out_q, metrics):
+        try:
+            for item in source:
+                if self._stop.is_set():
+                    break
+                start = time.time()
+                result = fn(item)
+                metrics.busy_seconds += time.time() - start
+                metrics.items += 1
+                self._put(out_q, result, metrics)
+        except Exception as e:
+            self._fail(metrics.name, e)
+        finally:
+            if out_q is not None:
+                out_q.put(_END)
+
+    def _run_stage(self, fn, in_q, out_q, metrics):
+        while True:
+            metrics.sample(in_q.qsize())
+            item = in_q.get()
+            if item is _END:
+                break
+            if self._stop.is_set():
+                continue  # drain so upstream stages never block
+            try:
+                start = time.time()
+                result = fn(item)
+                metrics.busy_seconds += time.time() - start
+                metrics.items += 1
+                self._put(out_q, result, metrics)
+            except Exception as e:
+                self._fail(metrics.name, e)
+        if out_q is not None:
+            out_q.put(_END)
+
+    def run(self, source):
+        start = time.time()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages[1:]] + [None]
+        threads = [
+            threading.Thread(
+                target=self._run_source,
+                args=(source, self.stages[0][1], queues[0], self.metrics[0]),
+                name=f"pipeline-{self.stages[0][0]}",
+                daemon=True,
+            )
+        ]
+        for i in range(1, len(self.stages)):
+            threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(self.stages[i][1], queues[i - 1], queues[i], self.metrics[i]),
+                    name=f"pipeline-{self.stages[i][0]}",
+                    daemon=True,
+                )
+            )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.time() - start
+        self.log_metrics()
+        if self._error is not None:
+            raise self._error
+
+    def metrics_dict(self):
+        return {
+            "wall_seconds": round(self.wall_seconds, 4),
+            "stages": {m.name: m.to_dict() for m in self.metrics},
+        }
+
+    def log_metrics(self):
+        summary = ", ".join(
+            f"{m.name}: busy={m.busy_seconds:.2f}s occ={m.mean_occupancy:.2f}"
+            for m in self.metrics
+        )
+        logger.info(f"Pipeline finished in {self.wall_seconds:.2f}s ({summary})")
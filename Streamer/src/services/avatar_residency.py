@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def _resident_bytes(avatar):
+    try:
+        return int(avatar.memory_usage()["resident"])
+    except Exception as e:
+        logger.warning(f"Could not measure avatar memory: {e}")
+        return 0
+
+
+class AvatarResidencyCache:
+    """
+    Loaded avatars kept in memory under a byte budget.
+
+    Least recently used avatars are evicted once the resident total exceeds
+    ``budget_bytes``. Pinned avatars, and any key reported busy by
+    ``in_use(key)``, are never evicted, so the budget may be exceeded when
+    everything resident is pinned or active.
+    """
+
+    def __init__(self, budget_bytes, in_use=None):
+        self.budget_bytes = int(budget_bytes)
+        self._in_use = in_use or (lambda key: False)
+        self._avatars = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self._avatars
+
+    def __len__(self):
+        return len(self._avatars)
+
+    def __getitem__(self, key):
+        with self._lock:
+            return self._avatars[key]
+
+    def keys(self):
+        with self._lock:
+            return list(self._avatars.keys())
+
+    def get(self, key):
+        """Look up an avatar and mark it most recently used."""
+        with self._lock:
+            avatar = self._avatars.get(key)
+            if avatar is None:
+                self.misses += 1
+                return None
+            self._avatars.move_to_end(key)
+            self.hits += 1
+            return avatar
+
+    def put(self, key, avatar):
+        with self._lock:
+            self._avatars[key] = avatar
+            self._avatars.move_to_end(key)
+            self.evict(keep=key)
+
+    def pop(self, key, force=False):
+        """Remove an avatar; pinned ones are only removed with ``force``."""
+        with self._lock:
+            if key in self._pinned and not force:
+                return None
+            self._pinned.discard(key)
+            return self._avatars.pop(key, None)
+
+    def pin(self, key):
+        with self._lock:
+            if key not in self._avatars:
+                return False
+            self._pinned.add(key)
+            return True
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+            self.evict()
+
+    def is_pinned(self, key):
+        return key in self._pinned
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(_resident_bytes(a) for a in self._avatars.values())
+
+    def evict(self, keep=None):
+        """Drop LRU avatars until the resident total fits the budget."""
+        with self._lock:
+            total = self.resident_bytes()
+            for key in list(self._avatars.keys()):
+                if total <= self.budget_bytes:
+                    break
+                if key == keep or key in self._pinned or self._in_use(key):
+                    continue
+                total -= _resident_bytes(self._avatars.pop(key))
+                self.evictions += 1
+                logger.info(
+                    f"Evicted avatar {key} (resident {total / 2**20:.1f}MB / "
+                    f"budget {self.budget_bytes / 2**20:.1f}MB)"
+                )
+
+    def stats(self):
+        with self._lock:
+            avatars = []
+            for key, avatar in self._avatars.items():
+                try:
+                    usage = avatar.memory_usage()
+                except Exception:
+                    usage = {"resident": 0, "mapped": 0}
+                avatars.append(
+                    {
+                        "avatar_id": key,
+                        "resident_bytes": usage["resident"],
+                        "mapped_bytes": usage["mapped"],
+                        "pinned": key in self._pinned,
+                        "in_use": self._in_use(key),
+                    }
+                )
+            return {
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": sum(a["resident_bytes"] for a in avatars),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "avatars": avatars,
+            }
@@ -0,0 +1,193 @@
+import os
+import time
+import queue
+import threading
+from fractions import Fraction
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+class TranscodeError(RuntimeError):
+    """Avatar video could not be decoded, scaled or re-encoded."""
+
+
+def _scaled_size(width, height, target_width):
+    """Keep the aspect ratio; both sides even (libx264 / yuv420p requirement)."""
+    if not target_width:
+        return width - width % 2, height - height % 2
+    target_height = int(round(height * target_width / width / 2.0)) * 2
+    return int(target_width) - int(target_width) % 2, max(2, target_height)
+
+
+class _EncoderThread:
+    """Encodes BGR frames to an H.264 mp4 on a background thread."""
+
+    def __init__(self, output_path, width, height, fps, bitrate_kbps):
+        import av
+
+        self.output_path = output_path
+        self.tmp_path = f"{output_path}.tmp.mp4"
+        self.seconds = 0.0
+        self.error = None
+        self._queue = queue.Queue(maxsize=32)
+        self._container = av.open(
+            self.tmp_path, "w", format="mp4", options={"movflags": "+faststart"}
+        )
+        self._stream = self._container.add_stream("libx264", rate=int(fps))
+        self._stream.width = width
+        self._stream.height = height
+        self._stream.pix_fmt = "yuv420p"
+        self._stream.time_base = Fraction(1, int(fps))
+        if bitrate_kbps:
+            self._stream.bit_rate = int(bitrate_kbps) * 1000
+        self._stream.options = {"preset": "fast"}
+        self._thread = threading.Thread(
+            target=self._run, name="avatar-transcode-encode", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, image):
+        if self.error is not None:
+            raise TranscodeError(f"Encoding {self.output_path} failed: {self.error}")
+        self._queue.put(image)
+
+    def _run(self):
+        import av
+
+        pts = 0
+        try:
+            while True:
+                image = self._queue.get()
+                if image is None:
+                    break
+                if self.error is not None:
+                    continue  # drain so the producer never blocks
+                start = time.time()
+                frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+                frame.pts = pts
+                pts += 1
+                for packet in self._stream.encode(frame):
+                    self._container.mux(packet)
+                self.seconds += time.time() - start
+            if self.error is None:
+                start = time.time()
+                for packet in self._stream.encode():
+                    self._container.mux(packet)
+                self.seconds += time.time() - start
+        except Exception as e:
+            self.error = e
+            # keep draining until the sentinel arrives
+            while self._queue.get() is not None:
+                pass
+        finally:
+            try:
+                self._container.close()
+            except Exception as e:
+                self.error = self.error or e
+
+    def finish(self, commit=True):
+        self._queue.put(None)
+        self._thread.join()
+        if commit and self.error is None:
+            os.replace(self.tmp_path, self.output_path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        if commit and self.error is not None:
+            raise TranscodeError(f"Encoding {self.output_path} failed: {self.error}")
+
+
+def iter_transcoded_frames(
+    video_path,
+    target_width=None,
+    fps=None,
+    bitrate_kbps=None,
+    output_path=None,
+    skip=0,
+    timings=None,
+):
+    """
+    Decode ``video_path`` in-process with PyAV and yield BGR frames scaled to
+    ``target_width`` (aspect kept) at no more than ``fps``.
+
+    When ``output_path`` is given, the yielded frames are also encoded to an
+    H.264 mp4 there by a background thread, so compression overlaps with
+    whatever consumes the frames. The file only appears once every frame was
+    consumed. The first ``skip`` output frames are decoded but not yielded.
+
+    Per-stage seconds (decode, scale, encode) are added to ``timings`` and logged.
+    """
+    import av
+
+    stage = {"decode": 0.0, "scale": 0.0, "encode": 0.0}
+    frames_in = frames_out = 0
+    encoder = None
+    completed = False
+    try:
+        try:
+            container = av.open(video_path)
+        except Exception as e:
+            raise TranscodeError(f"Cannot open avatar video {video_path}: {e}") from e
+        try:
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            size = _scaled_size(stream.codec_context.width, stream.codec_context.height, target_width)
+            if output_path:
+                out_fps = fps or int(round(float(stream.average_rate or 25)))
+                encoder = _EncoderThread(output_path, size[0], size[1], out_fps, bitrate_kbps)
+
+            last_slot = -1
+            decoded = container.decode(stream)
+            while True:
+                start = time.time()
+                try:
+                    frame = next(decoded)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    raise TranscodeError(
+                        f"Decoding {video_path} failed after {frames_in} frames: {e}"
+                    ) from e
+                stage["decode"] += time.time() - start
+                frames_in += 1
+
+                # fps reduction: keep the first frame of each 1/fps slot
+                if fps and frame.time is not None:
+                    slot = int(frame.time * fps + 1e-6)
+                    if slot <= last_slot:
+                        continue
+                    last_slot = slot
+
+                if frames_out < skip and encoder is None:
+                    frames_out += 1
+                    continue
+                start = time.time()
+                image = frame.reformat(
+                    width=size[0], height=size[1], format="bgr24"
+                ).to_ndarray()
+                stage["scale"] += time.time() - start
+                if encoder is not None:
+                    encoder.put(image)
+                frames_out += 1
+                if frames_out > skip:
+                    yield image
+        finally:
+            container.close()
+        completed = True
+    finally:
+        if encoder is not None:
+            encoder.finish(commit=completed)
+            stage["encode"] = encoder.seconds
+        logger.info(
+            f"Transcoded {video_path}: {frames_in} -> {frames_out} frames, "
+            f"decode={stage['decode']:.2f}s scale={stage['scale']:.2f}s "
+            f"encode={stage['encode']:.2f}s"
+        )
+        if timings is not None:
+            for name, seconds in stage.items():
+                timings[name] = timings.get(name, 0.0) + seconds
@@ -0,0 +1,157 @@
+import time
+import threading
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+class BatchSizeTuner:
+    """
+    Picks the generation batch size for a target fps.
+
+    At warm-up every candidate's UNet+VAE latency is measured on the actual
+    device and the smallest batch whose throughput covers ``fps * headroom``
+    is chosen (smaller batches mean lower latency to the first frame). While
+    generating, the observed throughput is tracked and the batch steps up
+    when it can no longer sustain fps, or down when it has ample slack.
+    """
+
+    candidates = (1, 2, 4, 8, 16, 32)
+    # Throughput margin over the stream fps required from a batch size
+    headroom = 1.2
+    # Batches observed after a change before deciding again
+    settle_batches = 5
+    # Timed runs per candidate at warm-up (after one untimed run)
+    warmup_runs = 2
+
+    def __init__(self, max_batch_size=None, measurements=None):
+        self.max_batch_size = max_batch_size or self.candidates[-1]
+        self.candidates = tuple(b for b in self.candidates if b <= self.max_batch_size)
+        self.fps = None
+        self.batch_size = self.candidates[0]
+        self.reason = "not tuned yet"
+        # batch size -> seconds per batch; may be shared by tuners of the same models
+        self.measurements = measurements if measurements is not None else {}
+        self.adjustments = []
+        self._lock = threading.Lock()
+        self._ema = None
+        self._since_change = 0
+        self._floor = 0  # sizes below this index could not keep up at runtime
+
+    def current(self):
+        return self.batch_size
+
+    def warmup(self, measure, fps):
+        """
+        Choose a batch size for ``fps`` using ``measure(batch_size) -> seconds``,
+        measuring only candidates not timed before on this device.
+        """
+        with self._lock:
+            self.fps = fps
+            target = fps * self.headroom
+            chosen = None
+            for index, size in enumerate(self.candidates):
+                if size not in self.measurements:
+                    try:
+                        measure(size)  # first call pays for allocations / autotuning
+                        runs = [measure(size) for _ in range(self.warmup_runs)]
+                    except Exception as e:
+                        logger.warning(f"Batch size {size} could not be measured: {e}")
+                        break
+                    self.measurements[size] = sorted(runs)[len(runs) // 2]
+                if size / self.measurements[size] >= target:
+                    chosen = index
+                    break
+            if chosen is None:
+                # Nothing sustains the target: take the best throughput measured
+                measured = [i for i, b in enumerate(self.candidates) if b in self.measurements]
+                if not measured:
+                    chosen = 0
+                    self.reason = "no measurement succeeded; using the smallest batch"
+                else:
+                    chosen = max(
+                        measured,
+                        key=lambda i: self.candidates[i] / self.measurements[self.candidates[i]],
+                    )
+                    self.reason = (
+                        f"no batch sustains {target:.1f} fps; batch {self.candidates[chosen]} "
+                        f"gives the highest throughput "
+                        f"({self._measured_fps(self.candidates[chosen]):.1f} fps)"
+                    )
+            else:
+                size = self.candidates[chosen]
+                self.reason = (
+                    f"smallest batch sustaining {target:.1f} fps "
+                    f"({fps} fps x {self.headroom} headroom): {self._measured_fps(size):.1f} fps "
+                    f"at {self.measurements[size] * 1000:.0f}ms per batch"
+                )
+            self._floor = 0
+            self._set(chosen, self.reason)
+            logger.info(f"Auto batch size {self.batch_size}: {self.reason}")
+            return self.batch_size
+
+    def _measured_fps(self, size):
+        return size / self.measurements[size]
+
+    def _set(self, index, reason):
+        self.batch_size = self.candidates[index]
+        self.reason = reason
+        self._ema = None
+        self._since_change = 0
+        self.adjustments.append(
+            {"time": time.time(), "batch_size": self.batch_size, "reason": reason}
+        )
+        del self.adjustments[:-20]
+
+    def observe(self, frames, seconds):
+        """Feed the UNet+VAE time of one generated batch; may change ``batch_size``."""
+        if not self.fps or seconds <= 0:
+            return
+        with self._lock:
+            rate = frames / seconds
+            self._ema = rate if self._ema is None else 0.8 * self._ema + 0.2 * rate
+            self._since_change += 1
+            if self._since_change < self.settle_batches:
+                return
+            index = self.candidates.index(self.batch_size)
+            if self._ema < self.fps and index + 1 < len(self.candidates):
+                # Never step back below a size that could not keep up
+                self._floor = index + 1
+                self._set(
+                    index + 1,
+                    f"throughput drifted to {self._ema:.1f} fps, below {self.fps} fps",
+                )
+            elif (
+                self._ema > 2 * self.fps * self.headroom
+                and index > self._floor
+            ):
+                self._set(
+                    index - 1,
+                    f"throughput {self._ema:.1f} fps leaves ample slack; lowering latency",
+                )
+            else:
+                return
+            logger.info(f"Auto batch size -> {self.batch_size}: {self.adjustments[-1]['reason']}")
+
+    def status(self):
+        return {
+            "mode": "auto",
+            "batch_size": self.batch_size,
+            "target_fps": self.fps,
+            "reason": self.reason,
+            "observed_fps": round(self._ema, 2) if self._ema else None,
+            "measurements": [
+                {
+                    "batch_size": size,
+                    "latency_ms": round(seconds * 1000, 1),
+                    "fps": round(size / seconds, 1),
+                }
+                for size, seconds in sorted(self.measurements.items())
+            ],
+            "adjustments": list(self.adjustments),
+        }
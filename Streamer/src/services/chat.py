@@ -6,7 +6,6 @@ import asyncio
 import time
 import datetime
 import logging
-from ..api._manager import connection_manager
 import json
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s")
@@ -140,6 +139,7 @@ class YouTubeChatHandler(ChatHandler):
                         try:
                             # push cho client websocket
                             logger.info("Sending comments through websocket...")
+                            from ..api._manager import connection_manager
                             target_loop = getattr(connection_manager, "loop", None)
                             if not target_loop:
                                 logger.warning("connection_manager.loop not set; broadcast may fail. Please set it on FastAPI startup.")
@@ -259,6 +259,7 @@ class TikTokChatHandler(ChatHandler):
                     try:
                         # push cho client websocket
                         logger.info("Sending comments through websocket...")
+                        from ..api._manager import connection_manager
                         target_loop = getattr(connection_manager, "loop", None)
                         if not target_loop:
                             logger.warning("connection_manager.loop not set; broadcast may fail. Please set it on FastAPI startup.")
@@ -0,0 +1,227 @@
+import os
+import copy
+import json
+import hashlib
+from types import SimpleNamespace
+
+import torch
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+# Relative error allowed between compiled and eager outputs
+_PARITY_TOLERANCE = {torch.float32: 1e-3, torch.bfloat16: 3e-2, torch.float16: 2e-2}
+
+
+class _UNetForward(torch.nn.Module):
+    """Tensor-only UNet signature, so it can be traced."""
+
+    def __init__(self, unet):
+        super().__init__()
+        self.unet = unet
+
+    def forward(self, sample, timestep, encoder_hidden_states):
+        return self.unet(
+            sample, timestep, encoder_hidden_states=encoder_hidden_states, return_dict=False
+        )[0]
+
+
+class _VAEDecode(torch.nn.Module):
+    """Tensor-only VAE decoder."""
+
+    def __init__(self, vae):
+        super().__init__()
+        self.vae = vae
+
+    def forward(self, latents):
+        return self.vae.decode(latents, return_dict=False)[0]
+
+
+class _FallbackModule:
+    """
+    Calls the compiled module, switching to the eager one for good the first
+    time the compiled path raises.
+    """
+
+    def __init__(self, name, compiled, eager):
+        self.name = name
+        self.compiled = compiled
+        self.eager = eager
+
+    def __call__(self, *args):
+        if self.compiled is not None:
+            try:
+                return self.compiled(*args)
+            except Exception as e:
+                logger.error(f"Compiled {self.name} failed, falling back to eager: {e}")
+                self.compiled = None
+        return self.eager(*args)
+
+
+class _CompiledUNetModel:
+    """Stands in for ``unet.model``: same call and ``.sample`` result."""
+
+    def __init__(self, forward, dtype):
+        self._forward = forward
+        self.dtype = dtype
+
+    def __call__(self, sample, timestep, encoder_hidden_states=None):
+        return SimpleNamespace(sample=self._forward(sample, timestep, encoder_hidden_states))
+
+
+class _CompiledAutoencoder:
+    """Stands in for ``vae.vae`` inside MuseTalk's ``decode_latents``."""
+
+    def __init__(self, decode, eager):
+        self._decode = decode
+        self._eager = eager
+
+    @property
+    def dtype(self):
+        return self._eager.dtype
+
+    def decode(self, latents):
+        return SimpleNamespace(sample=self._decode(latents))
+
+
+def _file_stats(path):
+    """
+    [name, size, mtime] of ``path``, or of every file under it when it is a
+    directory (the directory's own mtime does not change when a file in it
+    is replaced).
+    """
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return [[os.path.basename(path), stat.st_size, stat.st_mtime_ns]]
+    stats = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            stat = os.stat(file_path)
+            stats.append([os.path.relpath(file_path, path), stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+def _artifact_key(model_paths, profile, extra):
+    info = {"torch": torch.__version__, "profile": profile.name, "extra": extra}
+    for path in model_paths:
+        info[os.path.basename(os.path.normpath(path))] = _file_stats(path)
+    return hashlib.sha256(json.dumps(info, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _trace(module, example_inputs, profile):
+    with profile.context():
+        traced = torch.jit.trace(module.eval(), example_inputs, check_trace=False)
+    traced = torch.jit.freeze(traced.eval())
+    if profile.device.type == "cpu":
+        try:
+            # Conv/BN folding and oneDNN layouts; not available for every dtype
+            traced = torch.jit.optimize_for_inference(traced)
+        except Exception as e:
+            logger.info(f"optimize_for_inference skipped: {e}")
+    return traced
+
+
+def _load_or_export(name, path, module, example_inputs, profile):
+    if os.path.exists(path):
+        try:
+            logger.info(f"Loading compiled {name} from {path}")
+            return torch.jit.load(path, map_location=profile.device)
+        except Exception as e:
+            logger.warning(f"Cached compiled {name} unusable ({e}); re-exporting")
+    logger.info(f"Exporting {name} to TorchScript...")
+    traced = _trace(module, example_inputs, profile)
+    tmp_path = f"{path}.tmp"
+    torch.jit.save(traced, tmp_path)
+    os.replace(tmp_path, path)
+    return traced
+
+
+def _relative_error(reference, candidate):
+    reference, candidate = reference.float(), candidate.float()
+    return ((reference - candidate).abs().max() / (reference.abs().max() + 1e-6)).item()
+
+
+def _check_parity(name, eager, compiled, inputs_by_batch, profile):
+    tolerance = _PARITY_TOLERANCE.get(profile.dtype, 1e-2)
+    with profile.context():
+        for inputs in inputs_by_batch:
+            error = _relative_error(eager(*inputs), compiled(*inputs))
+            if error > tolerance:
+                raise ValueError(
+                    f"{name} parity check failed at batch {inputs[0].shape[0]}: "
+                    f"relative error {error:.2e} > {tolerance:.0e}"
+                )
+            logger.info(
+                f"{name} parity at batch {inputs[0].shape[0]}: relative error {error:.2e}"
+            )
+
+
+def build_torchscript_backend(unet, vae, pe, profile, cache_dir, model_paths, chunk_shape):
+    """
+    Export (or load from ``cache_dir``) TorchScript versions of the UNet and
+    the VAE decoder, verify them against eager mode and return drop-in
+    ``(unet, vae)`` objects for generation. Raises when export or parity fails;
+    callers keep the eager models in that case.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = _artifact_key(model_paths, profile, list(chunk_shape))
+
+    def latents(batch, channels):
+        return profile.prepare_input(torch.randn(batch, channels, 32, 32))
+
+    def audio(batch):
+        with profile.context():
+            return pe(
+                torch.randn((batch,) + tuple(chunk_shape), device=profile.device, dtype=profile.dtype)
+            )
+
+    timesteps = torch.tensor([0], device=profile.device)
+    unet_forward = _UNetForward(unet.model)
+    vae_decode = _VAEDecode(vae.vae)
+
+    compiled_unet = _load_or_export(
+        "UNet",
+        os.path.join(cache_dir, f"unet-{key}.pt"),
+        unet_forward,
+        (latents(2, 8), timesteps, audio(2)),
+        profile,
+    )
+    compiled_vae = _load_or_export(
+        "VAE decoder",
+        os.path.join(cache_dir, f"vae_decoder-{key}.pt"),
+        vae_decode,
+        (latents(2, 4),),
+        profile,
+    )
+
+    # Batches other than the traced one catch shape specialization
+    _check_parity(
+        "UNet",
+        unet_forward,
+        compiled_unet,
+        [(latents(b, 8), timesteps, audio(b)) for b in (1, 3)],
+        profile,
+    )
+    _check_parity(
+        "VAE decoder", vae_decode, compiled_vae, [(latents(b, 4),) for b in (1, 3)], profile
+    )
+
+    unet_runtime = SimpleNamespace(
+        model=_CompiledUNetModel(
+            _FallbackModule("UNet", compiled_unet, unet_forward), unet.model.dtype
+        )
+    )
+    # MuseTalk's decode_latents (scaling, post-processing) on the compiled decoder
+    vae_runtime = copy.copy(vae)
+    vae_runtime.vae = _CompiledAutoencoder(
+        _FallbackModule("VAE decoder", compiled_vae, vae_decode), vae.vae
+    )
+    return unet_runtime, vae_runtime
@@ -0,0 +1,105 @@
+import os
+
+import torch
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+_CPU_DTYPES = {"float32": torch.float32, "bfloat16": torch.bfloat16}
+
+
+class InferenceProfile:
+    """
+    How the MuseTalk models are placed and run: device, dtype, memory format,
+    grad mode and (on CPU) thread counts.
+
+    GPU keeps the original fp16 setup. CPU never uses fp16 (slow or missing
+    kernels); it runs float32 by default or bfloat16 when requested, with
+    channels_last convolutions and ``torch.inference_mode``.
+    """
+
+    def __init__(
+        self,
+        device,
+        dtype,
+        channels_last=False,
+        intra_op_threads=None,
+        inter_op_threads=None,
+    ):
+        self.device = device
+        self.dtype = dtype
+        self.channels_last = channels_last
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+    @classmethod
+    def for_device(cls, device):
+        if device.type == "cuda":
+            return cls(device, torch.float16)
+        dtype_name = os.getenv("MUSETALK_CPU_DTYPE", "float32").lower()
+        if dtype_name not in _CPU_DTYPES:
+            raise ValueError(
+                f"MUSETALK_CPU_DTYPE must be one of {sorted(_CPU_DTYPES)}, got {dtype_name}"
+            )
+        cores = os.cpu_count() or 1
+        return cls(
+            device,
+            _CPU_DTYPES[dtype_name],
+            channels_last=os.getenv("MUSETALK_CPU_CHANNELS_LAST", "1") != "0",
+            # UNet and VAE run concurrently in the generation pipeline, so each
+            # gets half of the cores by default instead of oversubscribing them
+            intra_op_threads=int(
+                os.getenv("MUSETALK_CPU_THREADS", str(max(1, cores // 2)))
+            ),
+            inter_op_threads=int(os.getenv("MUSETALK_CPU_INTEROP_THREADS", "1")),
+        )
+
+    @property
+    def name(self):
+        name = f"{self.device.type}-{str(self.dtype).replace('torch.', '')}"
+        return name + "-cl" if self.channels_last else name
+
+    def apply_threads(self):
+        """Set torch thread pools; call before the first model runs."""
+        if self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError as e:
+                # Only allowed before any inter-op work started in this process
+                logger.warning(f"Could not set inter-op threads: {e}")
+
+    def place(self, module, convolutional=False):
+        """Move a model to the profile's device/dtype (channels_last for conv nets)."""
+        module = module.to(device=self.device, dtype=self.dtype)
+        if convolutional and self.channels_last:
+            module = module.to(memory_format=torch.channels_last)
+        return module.eval()
+
+    def prepare_input(self, tensor):
+        """Latent batch in the device/dtype/memory format the models expect."""
+        if self.channels_last and tensor.dim() == 4:
+            return tensor.to(
+                device=self.device, dtype=self.dtype, memory_format=torch.channels_last
+            )
+        return tensor.to(device=self.device, dtype=self.dtype)
+
+    def context(self):
+        return torch.inference_mode()
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "device": str(self.device),
+            "dtype": str(self.dtype).replace("torch.", ""),
+            "channels_last": self.channels_last,
+            "intra_op_threads": torch.get_num_threads(),
+            "inter_op_threads": torch.get_num_interop_threads(),
+        }
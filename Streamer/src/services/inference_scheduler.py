@@ -0,0 +1,230 @@
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import torch
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ("session", "latents", "audio", "future", "submitted_at")
+
+    def __init__(self, session, latents, audio):
+        self.session = session
+        self.latents = latents
+        self.audio = audio
+        self.future = Future()
+        self.submitted_at = time.time()
+
+    def shape(self):
+        return self.latents.shape[1:], self.audio.shape[1:]
+
+
+class _SessionStats:
+    __slots__ = ("requests", "frames", "wait_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.frames = 0
+        self.wait_seconds = 0.0
+
+
+class InferenceScheduler:
+    """
+    Shares one set of UNet / VAE models between generation sessions.
+
+    Sessions submit (latents, audio features) batches and get a Future of the
+    decoded faces. A UNet thread merges the pending batches of several
+    sessions into one forward pass, a VAE thread decodes the previous pass
+    meanwhile, and the faces are split back per request. Sessions are served
+    round-robin: a pass takes at most one batch per session, starting after
+    the session served first last time, up to ``max_batch_frames`` frames.
+
+    ``close`` retires a scheduler: sessions already registered keep being
+    served, and the threads exit once the last of them is released.
+    """
+
+    def __init__(self, unet, vae, timesteps, profile, max_batch_frames=32, name="float"):
+        self.unet = unet
+        self.vae = vae
+        self.timesteps = timesteps
+        self.profile = profile
+        self.max_batch_frames = max_batch_frames
+        self.name = name
+        self._pending = OrderedDict()  # session -> deque of requests, in serving order
+        self._cond = threading.Condition()
+        self._decode_queue = queue.Queue(maxsize=1)
+        self._threads = []
+        self._sessions = {}
+        self._closed = False
+        self.passes = 0
+        self.frames = 0
+        self.session_slots = 0
+        self.unet_seconds = 0.0
+        self.vae_seconds = 0.0
+
+    def _start(self):
+        if self._threads:
+            return
+        for target, name in ((self._unet_loop, "unet"), (self._vae_loop, "vae")):
+            thread = threading.Thread(
+                target=target, name=f"scheduler-{self.name}-{name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def register(self, session):
+        """Count ``session`` as a user until ``release``, so ``close`` waits for it."""
+        with self._cond:
+            self._sessions.setdefault(session, _SessionStats())
+
+    def submit(self, session, latents, audio):
+        """Queue one batch of ``session``; the Future resolves to (faces, pass seconds)."""
+        request = _Request(session, latents, audio)
+        with self._cond:
+            self._start()
+            self._pending.setdefault(session, deque()).append(request)
+            self._sessions.setdefault(session, _SessionStats())
+            self._cond.notify()
+        return request.future
+
+    def release(self, session):
+        """Drop a finished (or failed) session and cancel its queued batches."""
+        with self._cond:
+            for request in self._pending.pop(session, ()):
+                request.future.cancel()
+            self._sessions.pop(session, None)
+            self._cond.notify_all()
+
+    def close(self):
+        """Stop the UNet/VAE threads once every registered session is released."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _next_pass(self):
+        with self._cond:
+            while not self._pending:
+                if self._closed and not self._sessions:
+                    return None
+                self._cond.wait()
+            taken, frames, shape = [], 0, None
+            for session in list(self._pending):
+                requests = self._pending[session]
+                request = requests[0]
+                if taken and (
+                    request.shape() != shape
+                    or frames + len(request.latents) > self.max_batch_frames
+                ):
+                    continue
+                requests.popleft()
+                # Served sessions go to the back of the order
+                if requests:
+                    self._pending.move_to_end(session)
+                else:
+                    del self._pending[session]
+                if not request.future.set_running_or_notify_cancel():
+                    continue
+                shape = request.shape()
+                taken.append(request)
+                frames += len(request.latents)
+            now = time.time()
+            for request in taken:
+                stats = self._sessions.get(request.session)
+                if stats is not None:
+                    stats.requests += 1
+                    stats.frames += len(request.latents)
+                    stats.wait_seconds += now - request.submitted_at
+            return taken
+
+    def _unet_loop(self):
+        while True:
+            requests = self._next_pass()
+            if requests is None:
+                # Closed: let the VAE thread finish the queued pass and exit too
+                self._decode_queue.put(None)
+                return
+            if not requests:
+                continue
+            try:
+                began = time.time()
+                with self.profile.context():
+                    latents = torch.cat([r.latents for r in requests])
+                    audio = torch.cat([r.audio for r in requests])
+                    pred = self.unet.model(
+                        latents, self.timesteps, encoder_hidden_states=audio
+                    ).sample
+                    pred = pred.to(dtype=self.vae.vae.dtype)
+                unet_seconds = time.time() - began
+            except Exception as e:
+                logger.error(f"Scheduler {self.name}: UNet pass failed: {e}")
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            self._decode_queue.put((requests, pred, unet_seconds))
+
+    def _vae_loop(self):
+        while True:
+            item = self._decode_queue.get()
+            if item is None:
+                return
+            requests, pred, unet_seconds = item
+            try:
+                began = time.time()
+                with self.profile.context():
+                    recon = self.vae.decode_latents(pred)
+                vae_seconds = time.time() - began
+            except Exception as e:
+                logger.error(f"Scheduler {self.name}: VAE pass failed: {e}")
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            self.passes += 1
+            self.frames += len(recon)
+            self.session_slots += len(requests)
+            self.unet_seconds += unet_seconds
+            self.vae_seconds += vae_seconds
+            offset = 0
+            for request in requests:
+                count = len(request.latents)
+                request.future.set_result(
+                    (recon[offset : offset + count], unet_seconds + vae_seconds)
+                )
+                offset += count
+
+    def stats(self):
+        with self._cond:
+            sessions = {
+                str(session): {
+                    "pending_batches": len(self._pending.get(session, ())),
+                    "batches": stats.requests,
+                    "frames": stats.frames,
+                    "mean_wait_ms": round(stats.wait_seconds / stats.requests * 1000, 1)
+                    if stats.requests
+                    else None,
+                }
+                for session, stats in self._sessions.items()
+            }
+        return {
+            "name": self.name,
+            "closed": self._closed,
+            "max_batch_frames": self.max_batch_frames,
+            "passes": self.passes,
+            "frames": self.frames,
+            "mean_frames_per_pass": round(self.frames / self.passes, 2) if self.passes else None,
+            "mean_sessions_per_pass": round(self.session_slots / self.passes, 2)
+            if self.passes
+            else None,
+            "unet_seconds": round(self.unet_seconds, 2),
+            "vae_seconds": round(self.vae_seconds, 2),
+            "sessions": sessions,
+        }
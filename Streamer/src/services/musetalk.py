@@ -1,11 +1,20 @@
 import os
 import sys
+import time
 from pathlib import Path
 import threading
-
-from src.models import Avatar
-from ..database.avatar import AvatarDatabaseService
-from .avatar import Avatar
+from collections import OrderedDict
+
+from .avatar import Avatar, GenerationRun
+from .avatar_residency import AvatarResidencyCache
+from .audio_features import WhisperFeatureCache
+from .render_cache import RenderedSegmentCache
+from .batch_tuner import BatchSizeTuner
+from .inference_profile import InferenceProfile
+from .compiled_backend import build_torchscript_backend
+from .quantization import QUANTIZATION_MODES, quantize_models
+from .audio_features import iter_whisper_chunks
+from .inference_scheduler import InferenceScheduler
 
 import logging
 
@@ -45,12 +54,73 @@ class MuseTalkRealtimeService:
         self.fp = None
         self.timesteps = None
         self.weight_dtype = None
+        self.profile = None
+        # "eager" or "torchscript" (exported UNet / VAE decoder, parity-checked)
+        self.backend = os.getenv("MUSETALK_BACKEND", "eager").lower()
+        self.backend_status = None
+        # Models used for generation; the compiled ones when the backend is active
+        self.generation_unet = None
+        self.generation_vae = None
 
         self._initialized = False
         self._models_loaded = False
         self.musetalk_path = Path("../MuseTalk")
-        self._avatars = {}
         self._current_avatar = None  # track currently active avatar
+        # Avatars with a generation running -> number of running generations
+        self._generating = {}
+        self._generating_lock = threading.Lock()
+        # Generation runs by session: running ones and the last finished ones
+        self._runs = OrderedDict()
+        self.max_finished_runs = 16
+        # Loaded avatars, LRU-evicted past the memory budget (active/generating ones stay)
+        self._avatars = AvatarResidencyCache(
+            int(os.getenv("AVATAR_MEMORY_BUDGET_MB", "4096")) * 2**20,
+            in_use=lambda key: key == self._current_avatar or key in self._generating,
+        )
+        # One scheduler per model set merges the UNet/VAE passes of all sessions
+        self.use_scheduler = os.getenv("INFERENCE_SCHEDULER", "1") != "0"
+        self.scheduler_max_batch_frames = int(os.getenv("SCHEDULER_MAX_BATCH_FRAMES", "32"))
+        self._schedulers = {}
+        # Number of worker processes used to prepare new avatars (1 = serial)
+        self.prepare_workers = int(os.getenv("AVATAR_PREPARE_WORKERS", "1"))
+        # Crops per batched VAE encode / face-parsing pass during preparation
+        self.prepare_batch_size = int(os.getenv("AVATAR_PREPARE_BATCH_SIZE", "16"))
+        # Read avatar frames on demand (bounded LRU window) instead of all in RAM
+        self.lazy_frames = os.getenv("AVATAR_LAZY_FRAMES", "1") != "0"
+        # Whisper chunks of product audio already seen (disk + open mappings)
+        self.feature_cache = WhisperFeatureCache(
+            os.path.abspath(os.getenv("WHISPER_FEATURE_CACHE_DIR", "results/whisper_features"))
+        )
+        # Rendered frames of (avatar, audio) pairs; 0 disables the cache
+        render_quota_mb = int(os.getenv("RENDER_CACHE_QUOTA_MB", "2048"))
+        self.render_cache = (
+            RenderedSegmentCache(
+                os.path.abspath(os.getenv("RENDER_CACHE_DIR", "results/rendered")),
+                render_quota_mb * 2**20,
+            )
+            if render_quota_mb > 0
+            else None
+        )
+        # Choose the batch size for sessions created with batch_size <= 0 (auto):
+        # one tuner per (model set, fps), so a session at another fps never
+        # re-tunes running ones; latency measurements are shared per model set
+        self.max_auto_batch_size = int(os.getenv("AUTO_BATCH_SIZE_MAX", "32"))
+        self._batch_tuners = {}
+        self._tuner_measurements = {}
+        # int8 model sets, built in the background when a session first asks
+        # for them; sessions use the float models until the build is done
+        self._quantized = {}
+        self._quantize_lock = threading.Lock()
+        self._quantize_builds = {}  # mode -> building thread
+        self._quantize_errors = {}  # mode -> error of its last background build
+        self._quantize_builds_lock = threading.Lock()
+        # Avatar frames used to calibrate static int8 / to score int8 against fp32
+        self.quant_calibration_frames = int(os.getenv("QUANT_CALIBRATION_FRAMES", "32"))
+        self.quant_evaluation_frames = int(os.getenv("QUANT_EVALUATION_FRAMES", "8"))
+        # Threads blending generated faces into avatar frames
+        self.blend_workers = int(
+            os.getenv("AVATAR_BLEND_WORKERS", str(min(4, os.cpu_count() or 1)))
+        )
 
     def initialize_models(self, gpu_id=0, version="v15"):
         """
@@ -80,6 +150,9 @@ class MuseTalkRealtimeService:
                 f"cuda:{gpu_id}" if torch.cuda.is_available() else "cpu"
             )
             logger.info(f"Using device: {self.device}")
+            self.profile = InferenceProfile.for_device(self.device)
+            self.profile.apply_threads()
+            logger.info(f"Inference profile: {self.profile.describe()}")
 
             # Import MuseTalk modules
             from musetalk.utils.utils import load_all_model
@@ -95,10 +168,10 @@ class MuseTalkRealtimeService:
                 device=self.device,
             )
 
-            # Move to half precision and device
-            self.pe = self.pe.half().to(self.device)
-            self.vae.vae = self.vae.vae.half().to(self.device)
-            self.unet.model = self.unet.model.half().to(self.device)
+            # fp16 on GPU; float32/bfloat16 + channels_last on CPU
+            self.pe = self.profile.place(self.pe)
+            self.vae.vae = self.profile.place(self.vae.vae, convolutional=True)
+            self.unet.model = self.profile.place(self.unet.model, convolutional=True)
 
             # Setup timesteps
             self.timesteps = torch.tensor([0], device=self.device)
@@ -115,6 +188,8 @@ class MuseTalkRealtimeService:
             ).eval()
             self.whisper.requires_grad_(False)
 
+            self._load_backend()
+
             # Load Face Parser
             logger.info("Loading Face Parser...")
             if version == "v15":
@@ -122,6 +197,12 @@ class MuseTalkRealtimeService:
             else:
                 self.fp = FaceParsing()
 
+            # Landmark / face detection models load from relative paths when
+            # the module is imported: import it here, while in the MuseTalk
+            # directory, so avatar preparation never has to change directory
+            logger.info("Loading face landmark models...")
+            import musetalk.utils.preprocessing  # noqa: F401
+
             # Restore working directory
             os.chdir(original_cwd)
 
@@ -139,14 +220,58 @@ class MuseTalkRealtimeService:
                 pass
             return False
 
+    def _load_backend(self):
+        """
+        Swap in the compiled UNet / VAE decoder for generation. Any failure
+        (export, load, parity) keeps the eager models.
+        """
+        self.generation_unet, self.generation_vae = self.unet, self.vae
+        self.backend_status = {"requested": self.backend, "active": "eager", "reason": None}
+        if self.backend == "eager":
+            return
+        if self.backend != "torchscript":
+            self.backend_status["reason"] = f"unknown backend {self.backend}"
+            logger.warning(f"Unknown MUSETALK_BACKEND {self.backend}; using eager")
+            return
+
+        config = self.whisper.config
+        try:
+            started = time.time()
+            self.generation_unet, self.generation_vae = build_torchscript_backend(
+                self.unet,
+                self.vae,
+                self.pe,
+                self.profile,
+                os.path.abspath("./models/compiled"),
+                [
+                    "./models/musetalk/pytorch_model.bin",
+                    "./models/musetalk/musetalk.json",
+                    "./models/sd-vae",
+                ],
+                # 2 * (2 + 2 + 1) frames of context (default padding) x hidden states
+                (10 * (config.encoder_layers + 1), config.d_model),
+            )
+            self.backend_status["active"] = "torchscript"
+            logger.info(f"TorchScript backend ready in {time.time() - started:.1f}s")
+        except Exception as e:
+            self.generation_unet, self.generation_vae = self.unet, self.vae
+            self.backend_status["reason"] = str(e)
+            logger.warning(f"TorchScript backend unavailable, using eager: {e}")
+
     def prepare_avatar(
         self,
         avatar_id: int,
         video_path: str,
         preparation: bool = True,
+        progress_callback=None,
+        activate: bool = True,
     ) -> bool:
         """
         Sử dụng Avatar class có sẵn từ MuseTalk để prepare avatar data
+
+        progress_callback(stage, fraction) is called while new material is prepared.
+        activate=False loads the avatar into the residency cache without making
+        it the current avatar (background preparation, preloading).
         """
         if not self._models_loaded:
             logger.warning("Models not loaded. Call initialize_models() first.")
@@ -155,16 +280,28 @@ class MuseTalkRealtimeService:
         key = str(avatar_id)
 
         # Check if avatar already prepared
-        if key in self._avatars:
+        if self._avatars.get(key) is not None:
             logger.info(f"Avatar {avatar_id} already prepared (cache hit)")
-            self._current_avatar = key
+            if activate:
+                self._current_avatar = key
+                # the previously active avatar may now be evicted
+                self._avatars.evict()
             return True
 
         logger.info(f"Preparing avatar: {avatar_id}")
         logger.info(f"  video_path={video_path} preparation={preparation}")
 
         try:
-            avatar_obj = Avatar(avatar_id, video_path, preparation)
+            avatar_obj = Avatar(
+                avatar_id,
+                video_path,
+                preparation,
+                prepare_workers=self.prepare_workers,
+                prepare_batch_size=self.prepare_batch_size,
+                lazy_frames=self.lazy_frames,
+                blend_workers=self.blend_workers,
+                progress_callback=progress_callback,
+            )
             success = avatar_obj.prepare_avatar(self.fp, self.vae)
         except Exception as e:
             # Log full error; often JSON errors surface here
@@ -174,8 +311,9 @@ class MuseTalkRealtimeService:
             return False
 
         if success:
-            self._avatars[key] = avatar_obj
-            self._current_avatar = key
+            if activate:
+                self._current_avatar = key
+            self._avatars.put(key, avatar_obj)
             logger.info(f"[Avatar {avatar_id}] prepared successfully.")
             return True
         else:
@@ -188,15 +326,25 @@ class MuseTalkRealtimeService:
         video_queue,
         fps: int = 25,
         batch_size: int = 4,
+        quantization: str = None,
+        avatar_id=None,
+        session_id=None,
     ):
         """
         Sử dụng logic có sẵn từ MuseTalk để generate frames cho WebRTC
+
+        batch_size <= 0 selects the auto-tuned batch size (see BatchSizeTuner).
+        quantization ("dynamic" / "static") runs int8 models on CPU.
+        avatar_id binds the generation to that (loaded) avatar instead of the
+        current one, so concurrent sessions do not depend on shared state;
+        session_id identifies the session to the inference scheduler.
         """
         if not self._models_loaded:
             logger.warning("Models not loaded. Call initialize_models() first.")
             return
 
-        if not self._current_avatar or self._current_avatar not in self._avatars:
+        avatar_key = str(avatar_id) if avatar_id is not None else self._current_avatar
+        if not avatar_key or avatar_key not in self._avatars:
             logger.warning("No avatar prepared. Call prepare_avatar() first.")
             return
 
@@ -205,29 +353,56 @@ class MuseTalkRealtimeService:
             return
 
         logger.info(f"Starting realtime generation for audio: {audio_path}")
+        # Convert relative audio path to absolute before changing directories
+        if not os.path.isabs(audio_path):
+            audio_path = os.path.abspath(audio_path)
+        session = session_id if session_id is not None else id(video_queue)
+        run = GenerationRun(session, avatar_key)
+        scheduler = None
+        with self._generating_lock:
+            self._generating[avatar_key] = self._generating.get(avatar_key, 0) + 1
+            self._runs.pop(str(session), None)
+            self._runs[str(session)] = run
+            finished = [key for key, r in self._runs.items() if r.finished]
+            for key in finished[: max(0, len(finished) - self.max_finished_runs)]:
+                del self._runs[key]
         try:
-            # Convert relative audio path to absolute before changing directories
-            if not os.path.isabs(audio_path):
-                audio_path = os.path.abspath(audio_path)
-
-            musetalk_abs_path = os.path.abspath(str(self.musetalk_path))
-            original_cwd = os.getcwd()
-            os.chdir(musetalk_abs_path)
-
-            current_avatar = self.get_current_avatar()
+            current_avatar = self._avatars[avatar_key]
+            models = self._generation_models(quantization, current_avatar, audio_path)
+            if models is None:
+                quantization = None
+                models = (self.generation_unet, self.generation_vae, self.pe, self.profile)
+            unet, vae, pe, profile = models
+            batch_tuner = None
+            if batch_size is None or batch_size <= 0:
+                batch_tuner = self._batch_tuner(quantization, fps)
+                if batch_tuner.fps is None:
+                    batch_tuner.warmup(
+                        lambda size: self._measure_batch(current_avatar, size, models), fps
+                    )
+                batch_size = batch_tuner.current()
+            scheduler = self._scheduler(quantization, models, session)
             current_avatar.inference(
                 video_queue,
                 audio_path,
                 fps,
                 batch_size,
-                self.unet,
-                self.vae,
-                self.pe,
+                unet,
+                vae,
+                pe,
                 self.timesteps,
                 self.whisper,
                 self.audio_processor,
                 self.weight_dtype,
                 self.device,
+                feature_cache=self.feature_cache,
+                render_cache=self.render_cache,
+                render_tag=self.render_tag(quantization),
+                batch_tuner=batch_tuner,
+                profile=profile,
+                scheduler=scheduler,
+                session=session,
+                run=run,
             )
 
             logger.info("Realtime generation completed successfully")
@@ -235,10 +410,296 @@ class MuseTalkRealtimeService:
             logger.error(f"Realtime generation failed: {e}", exc_info=True)
             raise  # Re-raise exception to propagate failure
         finally:
-            try:
-                os.chdir(original_cwd)
-            except:
-                pass
+            if scheduler is not None:
+                # Also when inference returned before generating (cached render)
+                scheduler.release(session)
+            with self._generating_lock:
+                run.finished = True
+                self._generating[avatar_key] -= 1
+                if not self._generating[avatar_key]:
+                    del self._generating[avatar_key]
+
+    def preload_avatar(self, avatar_id: int, video_path: str, pin: bool = False) -> bool:
+        """
+        Load a prepared avatar into memory ahead of use and pull its data into
+        the page cache, so switching to it later does not touch the disk.
+        """
+        if not self.prepare_avatar(avatar_id, video_path, preparation=False, activate=False):
+            return False
+        key = str(avatar_id)
+        if pin:
+            self._avatars.pin(key)
+        self._avatars[key].warm()
+        return True
+
+    def pin_avatar(self, avatar_id) -> bool:
+        """Keep a loaded avatar resident regardless of the memory budget."""
+        return self._avatars.pin(str(avatar_id))
+
+    def unpin_avatar(self, avatar_id):
+        self._avatars.unpin(str(avatar_id))
+
+    def is_avatar_pinned(self, avatar_id) -> bool:
+        return self._avatars.is_pinned(str(avatar_id))
+
+    def is_avatar_loaded(self, avatar_id) -> bool:
+        return str(avatar_id) in self._avatars
+
+    def loaded_avatar_ids(self):
+        """Ids of the avatars currently in memory (a snapshot list)."""
+        return list(self._avatars.keys())
+
+    def get_loaded_avatar(self, avatar_id):
+        """A loaded avatar (marked recently used), or None."""
+        return self._avatars.get(str(avatar_id))
+
+    def unload_avatar(self, avatar_id, force: bool = False) -> bool:
+        """
+        Drop a loaded avatar from memory unless it is the active one, a session
+        is generating with it, or it is pinned (dropped anyway with ``force``).
+        """
+        key = str(avatar_id)
+        with self._generating_lock:
+            if key == self._current_avatar or self._generating.get(key):
+                return False
+            return self._avatars.pop(key, force=force) is not None
+
+    def memory_stats(self):
+        """Residency cache budget, per-avatar memory and hit/eviction counters."""
+        stats = self._avatars.stats()
+        stats["current_avatar"] = self._current_avatar
+        return stats
+
+    def _measure_batch(self, avatar, batch_size, models=None):
+        """Seconds for one PE + UNet + VAE decode pass of ``batch_size`` frames."""
+        import torch
+
+        unet, vae, pe, profile = models or (
+            self.generation_unet,
+            self.generation_vae,
+            self.pe,
+            self.profile,
+        )
+        latents = profile.prepare_input(
+            torch.cat([avatar.input_latent_list_cycle[i] for i in range(batch_size)], dim=0)
+        )
+        # Silent audio features with the shape of real whisper chunks
+        chunk_length = 2 * (
+            avatar.audio_padding_length_left + avatar.audio_padding_length_right + 1
+        )
+        config = self.whisper.config
+        whisper_batch = torch.zeros(
+            (batch_size, chunk_length * (config.encoder_layers + 1), config.d_model),
+            device=self.device,
+            dtype=self.weight_dtype,
+        )
+        start = time.time()
+        with profile.context():
+            audio_feature_batch = pe(whisper_batch)
+            pred_latents = unet.model(
+                latents, self.timesteps, encoder_hidden_states=audio_feature_batch
+            ).sample
+            vae.decode_latents(pred_latents.to(dtype=vae.vae.dtype))
+        return time.time() - start
+
+    def _scheduler(self, quantization, models, session):
+        """
+        Shared inference scheduler of a model set (None when disabled), with
+        ``session`` registered on it; release the session when done.
+        """
+        if not self.use_scheduler:
+            return None
+        name = quantization or "float"
+        with self._generating_lock:
+            if name not in self._schedulers:
+                unet, vae, _, profile = models
+                self._schedulers[name] = InferenceScheduler(
+                    unet,
+                    vae,
+                    self.timesteps,
+                    profile,
+                    max_batch_frames=self.scheduler_max_batch_frames,
+                    name=name,
+                )
+            scheduler = self._schedulers[name]
+            # Registered under the lock that swaps schedulers, so a replaced
+            # one keeps its threads until this session is released
+            scheduler.register(session)
+            return scheduler
+
+    def scheduler_stats(self):
+        """Merged-pass and per-session counters of every inference scheduler."""
+        with self._generating_lock:
+            schedulers = list(self._schedulers.items())
+        return {name: scheduler.stats() for name, scheduler in schedulers}
+
+    def _batch_tuner(self, quantization, fps):
+        """Auto batch size tuner of a model set (float or an int8 mode) at ``fps``."""
+        name = quantization or "float"
+        with self._generating_lock:
+            key = (name, int(fps))
+            if key not in self._batch_tuners:
+                self._batch_tuners[key] = BatchSizeTuner(
+                    self.max_auto_batch_size,
+                    measurements=self._tuner_measurements.setdefault(name, {}),
+                )
+            return self._batch_tuners[key]
+
+    def batch_tuner_status(self):
+        """Auto batch size state of every (model set, fps) in use."""
+        return {
+            f"{name}@{fps}fps": tuner.status()
+            for (name, fps), tuner in sorted(self._batch_tuners.items())
+        }
+
+    def _generation_models(self, quantization, avatar, audio_path=None):
+        """(unet, vae, pe, profile) of an int8 mode, or None to use the float models."""
+        if not quantization:
+            return None
+        if quantization not in QUANTIZATION_MODES:
+            logger.warning(f"Unknown quantization mode {quantization}; using float models")
+            return None
+        if self.device.type != "cpu":
+            logger.warning("int8 quantization is CPU only; using float models")
+            return None
+        quantized = self._quantized.get(quantization)
+        if quantized is None:
+            self.quantize_in_background(quantization, avatar, audio_path)
+            logger.info(f"int8 {quantization} models not built yet; using float models")
+            return None
+        return quantized.unet, quantized.vae, quantized.pe, quantized.profile
+
+    def quantize_in_background(self, mode, avatar, audio_path=None):
+        """
+        Start building the int8 models of ``mode`` in a thread, unless they
+        are built, building, or their last background build failed (rebuild
+        those with ``quantize``).
+        """
+        with self._quantize_builds_lock:
+            if (
+                mode in self._quantized
+                or mode in self._quantize_builds
+                or mode in self._quantize_errors
+            ):
+                return
+
+            def build():
+                try:
+                    self.quantize(mode, avatar, audio_path)
+                except Exception as e:
+                    logger.error(f"Building int8 {mode} models failed: {e}", exc_info=True)
+                    with self._quantize_builds_lock:
+                        self._quantize_errors[mode] = str(e)
+                finally:
+                    with self._quantize_builds_lock:
+                        self._quantize_builds.pop(mode, None)
+
+            thread = threading.Thread(target=build, name=f"quantize-{mode}", daemon=True)
+            self._quantize_builds[mode] = thread
+            thread.start()
+
+    def quantize(self, mode, avatar, audio_path=None, rebuild=False):
+        """
+        int8 models of ``mode``, built once (static mode calibrated on
+        ``avatar``'s latents and ``audio_path``'s Whisper features) together
+        with a PSNR/SSIM report against the fp32 output.
+        """
+        with self._quantize_lock:
+            if mode in self._quantized and not rebuild:
+                return self._quantized[mode]
+            logger.info(f"Building int8 {mode} models with avatar {avatar.avatar_id}")
+            batches = self._quantization_batches(avatar, audio_path)
+            split = max(1, self.quant_calibration_frames // 4)
+            self._quantized[mode] = quantize_models(
+                mode,
+                self.unet,
+                self.vae,
+                self.pe,
+                self.timesteps,
+                self.profile,
+                calibration=batches[:split],
+                evaluation=batches[split:] or batches[-1:],
+            )
+            with self._generating_lock:
+                # Latencies of the previous build no longer apply
+                self._tuner_measurements.pop(mode, None)
+                for key in [key for key in self._batch_tuners if key[0] == mode]:
+                    del self._batch_tuners[key]
+                # New sessions get a scheduler with the rebuilt models
+                replaced = self._schedulers.pop(mode, None)
+            if replaced is not None:
+                replaced.close()
+            with self._quantize_builds_lock:
+                self._quantize_errors.pop(mode, None)
+            return self._quantized[mode]
+
+    def _quantization_batches(self, avatar, audio_path=None):
+        """(latents, whisper chunks) batches of 4 frames spread over the avatar cycle."""
+        import torch
+
+        total = self.quant_calibration_frames + self.quant_evaluation_frames
+        cycle = avatar.input_latent_list_cycle
+        indices = [(i * max(1, len(cycle) // total)) % len(cycle) for i in range(total)]
+        latents = [cycle[i].float() for i in indices]
+
+        chunks = []
+        if audio_path:
+            result = avatar._extract_audio_feature(
+                audio_path, self.audio_processor, self.weight_dtype
+            )
+            if result is not None:
+                for block in iter_whisper_chunks(
+                    result[0],
+                    result[1],
+                    self.whisper,
+                    self.device,
+                    self.weight_dtype,
+                    audio_padding_length_left=avatar.audio_padding_length_left,
+                    audio_padding_length_right=avatar.audio_padding_length_right,
+                ):
+                    chunks.extend(block.float())
+                    if len(chunks) >= total * 4:
+                        break
+        if chunks:
+            chunks = [chunks[i * len(chunks) // total] for i in range(total)]
+        else:
+            logger.warning("No calibration audio; using silent Whisper features")
+            config = self.whisper.config
+            chunk_length = 2 * (
+                avatar.audio_padding_length_left + avatar.audio_padding_length_right + 1
+            )
+            chunks = [
+                torch.zeros(chunk_length * (config.encoder_layers + 1), config.d_model)
+            ] * total
+
+        return [
+            (torch.cat(latents[i : i + 4]), torch.stack(chunks[i : i + 4]).to(self.device))
+            for i in range(0, total, 4)
+        ]
+
+    def quantization_status(self):
+        """Quality reports of the int8 modes built so far, and builds running or failed."""
+        status = {mode: {"report": quantized.report} for mode, quantized in self._quantized.items()}
+        with self._quantize_builds_lock:
+            for mode in self._quantize_builds:
+                status.setdefault(mode, {})["building"] = True
+            for mode, error in self._quantize_errors.items():
+                status.setdefault(mode, {})["error"] = error
+        return status
+
+    def render_tag(self, quantization=None):
+        """Identifies everything besides avatar/audio/fps that changes rendered output."""
+        tag = f"profile={self.profile.name if self.profile else self.weight_dtype}"
+        if self.backend_status and self.backend_status["active"] != "eager":
+            tag += f";backend={self.backend_status['active']}"
+        if quantization:
+            tag += f";int8={quantization}"
+        return tag
+
+    def generation_metrics(self):
+        """Progress and per-stage pipeline metrics of running and recent runs, by session."""
+        with self._generating_lock:
+            return {session: run.to_dict() for session, run in self._runs.items()}
 
     def is_ready(self):
         """Check xem models đã load chưa"""
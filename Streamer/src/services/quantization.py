@@ -0,0 +1,247 @@
+import copy
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import torch
+from torch import nn
+from torch.ao import quantization as tq
+
+from .inference_profile import InferenceProfile
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+# dynamic: int8 weights, activations quantized on the fly (Linear only in torch)
+# static: int8 weights and activations (Linear + Conv2d), ranges from calibration
+QUANTIZATION_MODES = ("dynamic", "static")
+
+# First and last convolutions stay in float: they carry most of the error
+_FLOAT_LAYERS = ("conv_in", "conv_out")
+
+
+class _Int8Layer(nn.Module):
+    """
+    Holds one Linear/Conv2d to quantize, with quant/dequant stubs around it
+    for static mode. Extra call arguments (diffusers' LoRA ``scale``) are
+    dropped since no LoRA is loaded.
+    """
+
+    def __init__(self, layer):
+        super().__init__()
+        self.quant = tq.QuantStub()
+        self.layer = layer
+        self.dequant = tq.DeQuantStub()
+
+    def forward(self, x, *args, **kwargs):
+        return self.dequant(self.layer(self.quant(x)))
+
+
+def _plain(layer):
+    """Copy of a Linear/Conv2d subclass as the exact torch type quantization maps."""
+    if type(layer) in (nn.Linear, nn.Conv2d):
+        return layer
+    if isinstance(layer, nn.Linear):
+        plain = nn.Linear(layer.in_features, layer.out_features, bias=layer.bias is not None)
+    else:
+        plain = nn.Conv2d(
+            layer.in_channels,
+            layer.out_channels,
+            layer.kernel_size,
+            stride=layer.stride,
+            padding=layer.padding,
+            dilation=layer.dilation,
+            groups=layer.groups,
+            bias=layer.bias is not None,
+            padding_mode=layer.padding_mode,
+        )
+    plain.load_state_dict(layer.state_dict())
+    return plain
+
+
+def _wrap_layers(model, types, prefixes=None):
+    """Wrap the quantizable layers of ``model`` in place; returns their names."""
+    targets = []
+    for name, module in model.named_modules():
+        if not isinstance(module, types) or name.split(".")[-1] in _FLOAT_LAYERS:
+            continue
+        if isinstance(module, nn.Conv2d) and module.padding_mode != "zeros":
+            continue
+        if prefixes and not name.startswith(prefixes):
+            continue
+        targets.append(name)
+    for name in targets:
+        parent_name, _, child = name.rpartition(".")
+        parent = model.get_submodule(parent_name) if parent_name else model
+        setattr(parent, child, _Int8Layer(_plain(getattr(parent, child))))
+    return targets
+
+
+def _engine():
+    engines = torch.backends.quantized.supported_engines
+    engine = "x86" if "x86" in engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+    return engine
+
+
+def psnr(reference, candidate):
+    """Peak signal-to-noise ratio (dB) of two uint8 images, capped at 100."""
+    mse = np.mean((reference.astype(np.float64) - candidate.astype(np.float64)) ** 2)
+    return 100.0 if mse == 0 else min(100.0, 10 * np.log10(255.0**2 / mse))
+
+
+def ssim(reference, candidate):
+    """Structural similarity of two uint8 BGR images (grayscale, 11x11 Gaussian window)."""
+    x = cv2.cvtColor(reference, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    y = cv2.cvtColor(candidate, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(image):
+        return cv2.GaussianBlur(image, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    var_x = blur(x * x) - mu_x**2
+    var_y = blur(y * y) - mu_y**2
+    cov = blur(x * y) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / (
+        (mu_x**2 + mu_y**2 + c1) * (var_x + var_y + c2)
+    )
+    return float(ssim_map.mean())
+
+
+class QuantizedModels:
+    """int8 UNet / VAE decoder of one mode, used like the float models in generation."""
+
+    def __init__(self, mode, unet, vae, pe, profile, report):
+        self.mode = mode
+        self.unet = unet
+        self.vae = vae
+        self.pe = pe
+        self.profile = profile
+        self.report = report
+
+
+def _float32(unet, vae, pe, profile):
+    """fp32 models on CPU: the loaded ones if already fp32, else float copies."""
+    if profile.dtype == torch.float32:
+        return unet.model, vae.vae, pe
+    logger.info("Making fp32 copies of the models for quantization")
+    return (
+        copy.deepcopy(unet.model).float(),
+        copy.deepcopy(vae.vae).float(),
+        copy.deepcopy(pe).float(),
+    )
+
+
+def _run(unet_model, vae, pe, timesteps, batches, profile):
+    """Decode every (latents, whisper) batch; returns the images and seconds per frame."""
+    images, frames, seconds = [], 0, 0.0
+    with profile.context():
+        for latents, whisper_batch in batches:
+            began = time.time()
+            audio = pe(whisper_batch)
+            pred = unet_model(
+                profile.prepare_input(latents), timesteps, encoder_hidden_states=audio
+            ).sample
+            images.extend(vae.decode_latents(pred.to(dtype=vae.vae.dtype)))
+            seconds += time.time() - began
+            frames += len(latents)
+    return images, seconds / max(frames, 1)
+
+
+def quantize_models(mode, unet, vae, pe, timesteps, profile, calibration, evaluation):
+    """
+    Build int8 copies of the UNet and the VAE decoder.
+
+    ``calibration`` and ``evaluation`` are lists of (latents, whisper chunks)
+    batches, e.g. from a stored avatar. Static mode observes activation ranges
+    on ``calibration``; both modes are then compared with the fp32 models on
+    ``evaluation`` (PSNR / SSIM of the decoded faces, time per frame).
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Quantization mode must be one of {QUANTIZATION_MODES}, got {mode}")
+    if profile.device.type != "cpu":
+        raise ValueError("int8 quantization runs on CPU only")
+
+    started = time.time()
+    engine = _engine()
+    fp32_profile = InferenceProfile(
+        profile.device,
+        torch.float32,
+        channels_last=profile.channels_last,
+        intra_op_threads=profile.intra_op_threads,
+        inter_op_threads=profile.inter_op_threads,
+    )
+    unet_fp32, autoencoder_fp32, pe_fp32 = _float32(unet, vae, pe, profile)
+    vae_ref = copy.copy(vae)
+    vae_ref.vae = autoencoder_fp32
+
+    unet_int8 = copy.deepcopy(unet_fp32)
+    autoencoder_int8 = copy.deepcopy(autoencoder_fp32)
+    # Only the decoder half of the autoencoder runs during generation
+    vae_prefixes = ("decoder.", "post_quant_conv")
+    if mode == "dynamic":
+        unet_layers = _wrap_layers(unet_int8, nn.Linear)
+        vae_layers = _wrap_layers(autoencoder_int8, nn.Linear, vae_prefixes)
+        for model, layers in ((unet_int8, unet_layers), (autoencoder_int8, vae_layers)):
+            tq.quantize_dynamic(
+                model,
+                {f"{name}.layer": tq.default_dynamic_qconfig for name in layers},
+                dtype=torch.qint8,
+                inplace=True,
+            )
+    else:
+        qconfig = tq.get_default_qconfig(engine)
+        unet_layers = _wrap_layers(unet_int8, (nn.Linear, nn.Conv2d))
+        vae_layers = _wrap_layers(autoencoder_int8, (nn.Linear, nn.Conv2d), vae_prefixes)
+        for model, layers in ((unet_int8, unet_layers), (autoencoder_int8, vae_layers)):
+            for name in layers:
+                model.get_submodule(name).qconfig = qconfig
+            tq.prepare(model, inplace=True)
+
+        logger.info(f"Calibrating static int8 on {sum(len(l) for l, _ in calibration)} frames")
+        vae_calibrating = copy.copy(vae)
+        vae_calibrating.vae = autoencoder_int8
+        with fp32_profile.context():
+            for latents, whisper_batch in calibration:
+                audio = pe_fp32(whisper_batch)
+                latents = fp32_profile.prepare_input(latents)
+                unet_int8(latents, timesteps, encoder_hidden_states=audio)
+                # The decoder is calibrated on what the fp32 UNet produces
+                pred = unet_fp32(latents, timesteps, encoder_hidden_states=audio).sample
+                vae_calibrating.decode_latents(pred)
+        tq.convert(unet_int8, inplace=True)
+        tq.convert(autoencoder_int8, inplace=True)
+
+    unet_q = SimpleNamespace(model=unet_int8)
+    vae_q = copy.copy(vae)
+    vae_q.vae = autoencoder_int8
+
+    reference, fp32_seconds = _run(unet_fp32, vae_ref, pe_fp32, timesteps, evaluation, fp32_profile)
+    quantized, int8_seconds = _run(unet_int8, vae_q, pe_fp32, timesteps, evaluation, fp32_profile)
+    psnrs = [psnr(a, b) for a, b in zip(reference, quantized)]
+    ssims = [ssim(a, b) for a, b in zip(reference, quantized)]
+    report = {
+        "mode": mode,
+        "engine": engine,
+        "quantized_layers": {"unet": len(unet_layers), "vae_decoder": len(vae_layers)},
+        "calibration_frames": sum(len(latents) for latents, _ in calibration)
+        if mode == "static"
+        else 0,
+        "evaluation_frames": len(reference),
+        "psnr_db": {"mean": round(float(np.mean(psnrs)), 2), "min": round(min(psnrs), 2)},
+        "ssim": {"mean": round(float(np.mean(ssims)), 4), "min": round(min(ssims), 4)},
+        "fp32_ms_per_frame": round(fp32_seconds * 1000, 1),
+        "int8_ms_per_frame": round(int8_seconds * 1000, 1),
+        "speedup": round(fp32_seconds / int8_seconds, 2) if int8_seconds else None,
+        "build_seconds": round(time.time() - started, 1),
+    }
+    logger.info(f"int8 {mode} quality report: {report}")
+    return QuantizedModels(mode, unet_q, vae_q, pe_fp32, fp32_profile, report)
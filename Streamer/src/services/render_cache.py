@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+import cv2
+import numpy as np
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] <%(name)s:%(lineno)d> - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+class RenderedSegment:
+    """Read side of a cached segment: JPEG frames packed in one file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = np.load(os.path.join(path, "index.npy"))
+        self._data = np.memmap(os.path.join(path, "frames.bin"), dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def frame(self, idx):
+        return cv2.imdecode(
+            np.asarray(self._data[self.offsets[idx] : self.offsets[idx + 1]]),
+            cv2.IMREAD_COLOR,
+        )
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.frame(idx)
+
+
+class SegmentRecorder:
+    """Write side: frames are JPEG encoded as they are rendered, published on commit."""
+
+    def __init__(self, cache, key, quality):
+        self.cache = cache
+        self.key = key
+        self.quality = quality
+        self.tmp_path = os.path.join(cache.root, f"{key}.{threading.get_ident()}.tmp")
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self._file = open(os.path.join(self.tmp_path, "frames.bin"), "wb")
+        self._offsets = [0]
+        self._closed = False
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def add(self, frame):
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encoding of a rendered frame failed")
+        self._file.write(encoded.tobytes())
+        self._offsets.append(self._offsets[-1] + len(encoded))
+
+    def commit(self, meta=None):
+        if self._closed:
+            return
+        self._closed = True
+        self._file.close()
+        np.save(os.path.join(self.tmp_path, "index.npy"), np.asarray(self._offsets, dtype=np.int64))
+        with open(os.path.join(self.tmp_path, "meta.json"), "w") as f:
+            json.dump(dict(meta or {}, frames=len(self)), f)
+        self.cache._publish(self.key, self.tmp_path)
+
+    def abort(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._file.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+class RenderedSegmentCache:
+    """
+    Fully rendered frame sequences of (avatar, audio) pairs, so replaying a
+    product streams stored frames instead of running UNet/VAE/blending.
+
+    Each entry is a directory under ``root``; its mtime is the LRU clock
+    (refreshed on every hit), and the least recently used entries are
+    removed when the total size exceeds ``quota_bytes``.
+    """
+
+    def __init__(self, root, quota_bytes, quality=90):
+        self.root = root
+        self.quota_bytes = int(quota_bytes)
+        self.quality = quality
+        # Guards the entries and the counters (sessions use the cache concurrently)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(avatar_key, audio_digest, fps, start_index=0, render_tag=None):
+        params = json.dumps(
+            {
+                "avatar": avatar_key,
+                "audio": audio_digest,
+                "fps": int(fps),
+                "start": int(start_index),
+                "render": render_tag,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(params.encode("utf-8")).hexdigest()[:24]
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, key)
+
+    def open(self, key):
+        path = self._entry_path(key)
+        with self._lock:
+            if not os.path.isdir(path):
+                self.misses += 1
+                return None
+            try:
+                segment = RenderedSegment(path)
+                os.utime(path)  # LRU touch
+                self.hits += 1
+                return segment
+            except Exception as e:
+                logger.warning(f"Discarding unreadable rendered segment {key}: {e}")
+                shutil.rmtree(path, ignore_errors=True)
+                self.misses += 1
+                return None
+
+    def recorder(self, key):
+        return SegmentRecorder(self, key, self.quality)
+
+    def _publish(self, key, tmp_path):
+        path = self._entry_path(key)
+        with self._lock:
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+            self._enforce_quota(keep=key)
+
+    @staticmethod
+    def _dir_size(path):
+        return sum(
+            os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+        )
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".tmp") or not os.path.isdir(path):
+                continue
+            try:
+                entries.append((os.path.getmtime(path), name, self._dir_size(path)))
+            except OSError:
+                continue
+        return sorted(entries)
+
+    def _enforce_quota(self, keep=None):
+        entries = self._entries()
+        total = sum(size for _, _, size in entries)
+        for _, name, size in entries:
+            if total <= self.quota_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted rendered segment {name} ({size / 2**20:.1f}MB)")
+
+    def stats(self):
+        with self._lock:
+            entries = self._entries()
+            return {
+                "entries": len(entries),
+                "bytes": sum(size for _, _, size in entries),
+                "quota_bytes": self.quota_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def replay_segment(segment, video_queue, timeout=1.0):
+    """Stream a cached segment into ``video_queue``; the consumer sets the pace."""
+    start = time.time()
+    for idx, frame in enumerate(segment):
+        try:
+            video_queue.put((idx, frame), timeout=timeout)
+        except Exception:
+            # Consumer stalled; drop the frame like live generation does
+            pass
+    logger.info(f"Replayed {len(segment)} cached frames in {time.time() - start:.2f}s")
@@ -11,6 +11,7 @@ from .llm import LLMService
 from .tts import TTSService
 from .musetalk import get_musetalk_realtime_service
 from .webrtc import webrtc_service
+from .avatar_jobs import avatar_job_runner
 from ..database import StreamSessionDatabaseService
 
 import logging
@@ -23,10 +24,12 @@ logger = logging.getLogger(__name__)
 
 import json
 import asyncio
-from ..api._manager import connection_manager
 
 
 def send_status(status):
+    # Imported here: src.api imports this package, so a module-level import is circular
+    from ..api._manager import connection_manager
+
     try:
         # push cho client websocket
         logger.info("Sending generate status through websocket...")
@@ -195,6 +198,12 @@ class StreamProcessor:
         try:
             # Get session avatar info
             avatar_id = session.avatar_id
+            # A background job holds the avatar's preparation lock: preparing
+            # inline would block the event loop until the job finishes
+            job = self.active_preparation_job(avatar_id)
+            if job is not None:
+                logger.info(f"Avatar {avatar_id} is being prepared by job {job.job_id}")
+                return False
             avatar_video_path = session.avatar.video_path
             avatar_preparation = not session.avatar.is_prepared
 
@@ -206,6 +215,11 @@ class StreamProcessor:
             logger.error(f"Error create avatar: {e}")
             return False
 
+    def active_preparation_job(self, avatar_id):
+        """Queued or running background preparation job of an avatar, if any."""
+        job = avatar_job_runner.get_avatar_job(avatar_id)
+        return job if job is not None and job.is_active else None
+
     # === New realtime methods for per-product generation ===
     async def start_product(self, db: Session, session_id: str, product_id: str):
         """
@@ -243,6 +257,14 @@ class StreamProcessor:
                     "detail": f"MuseTalk service is not available",
                 }
 
+            job = self.active_preparation_job(session.avatar_id)
+            if job is not None:
+                return {
+                    "status": "busy",
+                    "detail": f"Avatar {session.avatar_id} is still being prepared",
+                    "job": job.to_dict(),
+                }
+
             try:
                 self.prepare_avatar_for_realtime(session)
                 logger.info("Session's avatar is ready...")
@@ -320,7 +342,10 @@ class StreamProcessor:
 
             # Use session fps
             fps = session.stream_fps or 25
-            batch_size = session.batch_size or 1
+            # batch_size <= 0 lets the MuseTalk service auto-tune it
+            batch_size = session.batch_size if session.batch_size is not None else 1
+            quantization = session.quantization
+            avatar_id = session.avatar_id
 
             # Start producer thread for this product only
             def _produce():
@@ -334,6 +359,9 @@ class StreamProcessor:
                                 video_queue=video_q,
                                 fps=fps,
                                 batch_size=batch_size,
+                                quantization=quantization,
+                                avatar_id=avatar_id,
+                                session_id=session_id,
                             )
                         except Exception as e:
                             logger.error(
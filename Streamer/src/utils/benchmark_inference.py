@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Sustained-throughput benchmark of the MuseTalk realtime models (PE + UNet +
+VAE decode) under the configured inference profile.
+
+Run from the Streamer directory, e.g. on a GPU-less box:
+
+    MUSETALK_CPU_DTYPE=bfloat16 python -m src.utils.benchmark_inference --seconds 30
+
+The profile is read from the same environment variables as the server
+(MUSETALK_CPU_DTYPE, MUSETALK_CPU_CHANNELS_LAST, MUSETALK_CPU_THREADS,
+MUSETALK_CPU_INTEROP_THREADS) and MUSETALK_BACKEND=torchscript benchmarks the
+exported models. Each batch size runs for ``--seconds`` after a
+warm-up pass; the sustained fps is frames produced / wall time.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def benchmark(service, batch_size, seconds, chunk_shape):
+    import torch
+
+    profile = service.profile
+    # Avatar latents are 8 channels (masked + reference) at 32x32
+    latents = profile.prepare_input(torch.randn(batch_size, 8, 32, 32))
+    whisper_batch = torch.zeros(
+        (batch_size,) + chunk_shape, device=service.device, dtype=service.weight_dtype
+    )
+
+    def step():
+        with profile.context():
+            audio_feature_batch = service.pe(whisper_batch)
+            pred_latents = service.generation_unet.model(
+                latents, service.timesteps, encoder_hidden_states=audio_feature_batch
+            ).sample
+            service.generation_vae.decode_latents(
+                pred_latents.to(dtype=service.generation_vae.vae.dtype)
+            )
+
+    step()  # warm-up: allocations, kernel selection
+    latencies = []
+    start = time.time()
+    while time.time() - start < seconds:
+        began = time.time()
+        step()
+        latencies.append(time.time() - began)
+    wall = time.time() - start
+    latencies.sort()
+    return {
+        "batch_size": batch_size,
+        "batches": len(latencies),
+        "sustained_fps": round(batch_size * len(latencies) / wall, 2),
+        "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-sizes", default="1,2,4,8", help="comma separated")
+    parser.add_argument("--seconds", type=float, default=20.0, help="per batch size")
+    parser.add_argument("--fps", type=int, default=25, help="target stream fps")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    from src.services.musetalk import get_musetalk_realtime_service
+
+    service = get_musetalk_realtime_service()
+    if not service.initialize_models():
+        print("❌ Failed to load MuseTalk models")
+        return 1
+
+    config = service.whisper.config
+    # 2 * (2 + 2 + 1) frames of context (default padding) x hidden states
+    chunk_shape = (10 * (config.encoder_layers + 1), config.d_model)
+
+    print(f"Profile: {service.profile.describe()}")
+    print(f"Backend: {service.backend_status}")
+    print(f"Machine: {platform.processor() or platform.machine()}, {os.cpu_count()} CPUs")
+    results = []
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        result = benchmark(service, batch_size, args.seconds, chunk_shape)
+        results.append(result)
+        verdict = "✓" if result["sustained_fps"] >= args.fps else "✗"
+        print(
+            f"{verdict} batch {batch_size:>3}: {result['sustained_fps']:>7.2f} fps sustained "
+            f"(p50 {result['latency_p50_ms']}ms, p95 {result['latency_p95_ms']}ms per batch)"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "profile": service.profile.describe(),
+                    "backend": service.backend_status,
+                    "target_fps": args.fps,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
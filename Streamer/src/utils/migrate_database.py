@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Database migration script to add avatar_id column to stream_sessions table
+Database migration script to add the avatar_id and quantization columns to
+the stream_sessions table
 """
 
 import sqlite3
@@ -9,7 +10,7 @@ from pathlib import Path
 
 
 def migrate_database():
-    """Add avatar_id column to stream_sessions table"""
+    """Add avatar_id and quantization columns to stream_sessions table"""
 
     # Database path
     db_path = Path("virtual_streamer.db")
@@ -31,81 +32,17 @@ def migrate_database():
 
         if "avatar_id" in columns:
             print("✓ avatar_id column already exists in stream_sessions table")
-            conn.close()
-            return True
-
-        print("Adding avatar_id column to stream_sessions table...")
-
-        # Check if avatars table exists
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='avatars'"
-        )
-        if not cursor.fetchone():
-            print("Creating avatars table first...")
-            create_avatars_table = """
-            CREATE TABLE avatars (
-                id INTEGER PRIMARY KEY,
-                video_path VARCHAR(500) NOT NULL UNIQUE,
-                name VARCHAR(255) NOT NULL,
-                is_prepared BOOLEAN DEFAULT 0,
-                bbox_shift INTEGER DEFAULT 0,
-                preparation_status VARCHAR(50) DEFAULT 'pending',
-                file_size INTEGER,
-                duration FLOAT,
-                resolution VARCHAR(20),
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-            cursor.execute(create_avatars_table)
-            print("✓ Created avatars table")
+        else:
+            _add_avatar_id(cursor)
 
-        # Add avatar_id column to stream_sessions
-        cursor.execute("ALTER TABLE stream_sessions ADD COLUMN avatar_id INTEGER")
-        print("✓ Added avatar_id column to stream_sessions")
-
-        # Check if there are existing sessions
-        cursor.execute("SELECT COUNT(*) FROM stream_sessions")
-        session_count = cursor.fetchone()[0]
-
-        if session_count > 0:
-            print(f"Found {session_count} existing sessions")
-
-            # Create a default avatar for existing sessions
-            default_avatar_path = "../MuseTalk/data/video/yongen.mp4"
+        if "quantization" in columns:
+            print("✓ quantization column already exists in stream_sessions table")
+        else:
+            # NULL = float models; "dynamic" / "static" = int8 models
             cursor.execute(
-                """
-                INSERT OR IGNORE INTO avatars (video_path, name, is_prepared, bbox_shift, preparation_status)
-                VALUES (?, ?, ?, ?, ?)
-            """,
-                (
-                    default_avatar_path,
-                    "Default Avatar (Migration)",
-                    False,
-                    0,
-                    "pending",
-                ),
+                "ALTER TABLE stream_sessions ADD COLUMN quantization VARCHAR(20)"
             )
-
-            # Get the avatar ID
-            cursor.execute(
-                "SELECT id FROM avatars WHERE video_path = ?", (default_avatar_path,)
-            )
-            avatar_row = cursor.fetchone()
-
-            if avatar_row:
-                avatar_id = avatar_row[0]
-                # Update existing sessions to use this avatar
-                cursor.execute(
-                    "UPDATE stream_sessions SET avatar_id = ? WHERE avatar_id IS NULL",
-                    (avatar_id,),
-                )
-                updated_sessions = cursor.rowcount
-                print(
-                    f"✓ Updated {updated_sessions} existing sessions with default avatar (ID: {avatar_id})"
-                )
-            else:
-                print("⚠ Warning: Could not create default avatar")
+            print("✓ Added quantization column to stream_sessions")
 
         # Commit changes
         conn.commit()
@@ -122,6 +59,82 @@ def migrate_database():
         return False
 
 
+def _add_avatar_id(cursor):
+    """Add avatar_id column (and the avatars table) to stream_sessions"""
+    print("Adding avatar_id column to stream_sessions table...")
+
+    # Check if avatars table exists
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='avatars'"
+    )
+    if not cursor.fetchone():
+        print("Creating avatars table first...")
+        create_avatars_table = """
+        CREATE TABLE avatars (
+            id INTEGER PRIMARY KEY,
+            video_path VARCHAR(500) NOT NULL UNIQUE,
+            name VARCHAR(255) NOT NULL,
+            is_prepared BOOLEAN DEFAULT 0,
+            bbox_shift INTEGER DEFAULT 0,
+            preparation_status VARCHAR(50) DEFAULT 'pending',
+            file_size INTEGER,
+            duration FLOAT,
+            resolution VARCHAR(20),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+        cursor.execute(create_avatars_table)
+        print("✓ Created avatars table")
+
+    # Add avatar_id column to stream_sessions
+    cursor.execute("ALTER TABLE stream_sessions ADD COLUMN avatar_id INTEGER")
+    print("✓ Added avatar_id column to stream_sessions")
+
+    # Check if there are existing sessions
+    cursor.execute("SELECT COUNT(*) FROM stream_sessions")
+    session_count = cursor.fetchone()[0]
+
+    if session_count > 0:
+        print(f"Found {session_count} existing sessions")
+
+        # Create a default avatar for existing sessions
+        default_avatar_path = "../MuseTalk/data/video/yongen.mp4"
+        cursor.execute(
+            """
+            INSERT OR IGNORE INTO avatars (video_path, name, is_prepared, bbox_shift, preparation_status)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (
+                default_avatar_path,
+                "Default Avatar (Migration)",
+                False,
+                0,
+                "pending",
+            ),
+        )
+
+        # Get the avatar ID
+        cursor.execute(
+            "SELECT id FROM avatars WHERE video_path = ?", (default_avatar_path,)
+        )
+        avatar_row = cursor.fetchone()
+
+        if avatar_row:
+            avatar_id = avatar_row[0]
+            # Update existing sessions to use this avatar
+            cursor.execute(
+                "UPDATE stream_sessions SET avatar_id = ? WHERE avatar_id IS NULL",
+                (avatar_id,),
+            )
+            updated_sessions = cursor.rowcount
+            print(
+                f"✓ Updated {updated_sessions} existing sessions with default avatar (ID: {avatar_id})"
+            )
+        else:
+            print("⚠ Warning: Could not create default avatar")
+
+
 def verify_migration():
     """Verify that migration was successful"""
     db_path = Path("virtual_streamer.db")
@@ -144,6 +157,12 @@ def verify_migration():
 
         print("✓ avatar_id column exists in stream_sessions")
 
+        if "quantization" not in columns:
+            print("❌ quantization column not found in stream_sessions")
+            return False
+
+        print("✓ quantization column exists in stream_sessions")
+
         # Check avatars table
         cursor.execute(
             "SELECT name FROM sqlite_master WHERE type='table' AND name='avatars'"
@@ -177,7 +196,7 @@ def verify_migration():
 
 if __name__ == "__main__":
     print("=== Database Migration Script ===")
-    print("Adding avatar_id column to stream_sessions table")
+    print("Adding avatar_id and quantization columns to stream_sessions table")
     print()
 
     success = migrate_database()
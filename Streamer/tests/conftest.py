@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the app as ``src.*``, like main.py does from the Streamer directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,96 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from src.services.audio_features import AUDIO_SAMPLE_RATE, iter_whisper_chunks
+
+WINDOW_SAMPLES = 30 * AUDIO_SAMPLE_RATE
+
+
+class FakeWhisper:
+    """Encoder stand-in: 1500 features per 30 s window, 3 layers of 4 dims."""
+
+    def __init__(self):
+        self.encoder = self._encode
+
+    @staticmethod
+    def _encode(input_feature, output_hidden_states=True):
+        features = input_feature[:, :4, ::2].transpose(1, 2)  # (1, 1500, 4)
+        return SimpleNamespace(hidden_states=tuple(features * (i + 1) for i in range(3)))
+
+
+def input_windows(librosa_length):
+    generator = torch.Generator().manual_seed(librosa_length)
+    count = math.ceil(librosa_length / WINDOW_SAMPLES)
+    return [torch.rand(1, 80, 3000, generator=generator) for _ in range(count)]
+
+
+def reference_whisper_chunk(
+    whisper_input_features,
+    whisper,
+    librosa_length,
+    fps=25,
+    audio_padding_length_left=2,
+    audio_padding_length_right=2,
+):
+    """MuseTalk's ``AudioProcessor.get_whisper_chunk`` (device/dtype handling dropped)."""
+    audio_feature_length_per_frame = 2 * (
+        audio_padding_length_left + audio_padding_length_right + 1
+    )
+    whisper_feature = []
+    for input_feature in whisper_input_features:
+        audio_feats = whisper.encoder(input_feature, output_hidden_states=True).hidden_states
+        whisper_feature.append(torch.stack(audio_feats, dim=2))
+    whisper_feature = torch.cat(whisper_feature, dim=1)
+    whisper_idx_multiplier = 50 / fps
+    num_frames = math.floor((librosa_length / 16000) * fps)
+    actual_length = math.floor((librosa_length / 16000) * 50)
+    whisper_feature = whisper_feature[:, :actual_length, ...]
+    padding_nums = math.ceil(whisper_idx_multiplier)
+    whisper_feature = torch.cat(
+        [
+            torch.zeros_like(whisper_feature[:, : padding_nums * audio_padding_length_left]),
+            whisper_feature,
+            torch.zeros_like(
+                whisper_feature[:, : padding_nums * 3 * audio_padding_length_right]
+            ),
+        ],
+        1,
+    )
+    audio_prompts = []
+    for frame_index in range(num_frames):
+        audio_index = math.floor(frame_index * whisper_idx_multiplier)
+        audio_clip = whisper_feature[:, audio_index : audio_index + audio_feature_length_per_frame]
+        assert audio_clip.shape[1] == audio_feature_length_per_frame
+        audio_prompts.append(audio_clip)
+    audio_prompts = torch.cat(audio_prompts, dim=0)
+    return audio_prompts.reshape(audio_prompts.shape[0], -1, audio_prompts.shape[-1])
+
+
+@pytest.mark.parametrize(
+    "seconds",
+    [
+        12.3,
+        30.0,
+        # The last window holds fewer features than the right padding
+        30.04,
+        60.02,
+        61.5,
+    ],
+)
+@pytest.mark.parametrize("fps", [25, 30])
+def test_iter_whisper_chunks_matches_get_whisper_chunk(seconds, fps):
+    librosa_length = int(seconds * AUDIO_SAMPLE_RATE)
+    windows = input_windows(librosa_length)
+    whisper = FakeWhisper()
+
+    expected = reference_whisper_chunk(windows, whisper, librosa_length, fps=fps)
+    blocks = list(
+        iter_whisper_chunks(windows, librosa_length, whisper, "cpu", torch.float32, fps=fps)
+    )
+
+    assert len(blocks) >= 1
+    assert torch.equal(torch.cat(blocks, dim=0), expected)
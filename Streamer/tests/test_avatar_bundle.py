@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.services.avatar_bundle import open_bundle, pack_ragged, unpack_ragged, write_bundle
+
+
+def ragged_masks(count=5, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        rng.integers(0, 256, size=(int(rng.integers(1, 40)), int(rng.integers(1, 40))), dtype=np.uint8)
+        for _ in range(count)
+    ]
+
+
+def test_pack_ragged_round_trip():
+    masks = ragged_masks()
+    data, offsets, shapes = pack_ragged(masks)
+
+    assert len(offsets) == len(masks) + 1
+    assert offsets[-1] == len(data) == sum(m.size for m in masks)
+    for original, unpacked in zip(masks, unpack_ragged(data, offsets, shapes)):
+        np.testing.assert_array_equal(unpacked, original)
+
+
+def test_bundle_round_trip(tmp_path):
+    masks = ragged_masks(seed=1)
+    data, offsets, shapes = pack_ragged(masks)
+    coords = np.arange(40, dtype=np.int32).reshape(10, 4)
+    frames = [np.full((8, 6, 3), i, dtype=np.uint8) for i in range(3)]
+    path = tmp_path / "avatar.bundle"
+
+    write_bundle(
+        str(path),
+        {
+            "coords": coords,
+            "frames": frames,
+            "mask_data": data,
+            "mask_offsets": offsets,
+            "mask_shapes": shapes,
+        },
+        meta={"avatar_id": "a1"},
+    )
+    bundle = open_bundle(str(path))
+
+    assert bundle.meta == {"avatar_id": "a1"}
+    assert "coords" in bundle and "missing" not in bundle
+    np.testing.assert_array_equal(bundle.array("coords"), coords)
+    np.testing.assert_array_equal(bundle.array("frames"), np.stack(frames))
+    assert bundle.ragged_len("mask") == len(masks)
+    for i, original in enumerate(masks):
+        np.testing.assert_array_equal(bundle.ragged("mask", i), original)
+    assert not (tmp_path / "avatar.bundle.tmp").exists()
+
+
+def test_open_bundle_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a.bundle"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        open_bundle(str(path))
@@ -0,0 +1,91 @@
+import multiprocessing
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+pytest.importorskip("PIL")
+
+from src.services.avatar import _init_prepare_worker, _mask_shard
+
+# Minimal MuseTalk checkout: a face parser and the two blending helpers the
+# mask shards call, with MuseTalk's crop box rule
+FAKE_MUSETALK = {
+    "musetalk/__init__.py": "",
+    "musetalk/utils/__init__.py": "",
+    "musetalk/utils/face_parsing.py": """
+        import torch
+
+
+        class _Net(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.conv = torch.nn.Conv2d(3, 1, 1)
+
+            def forward(self, x):
+                return (self.conv(x),)
+
+
+        class FaceParsing:
+            def __init__(self, left_cheek_width=80, right_cheek_width=80):
+                self.net = _Net()
+
+            def preprocess(self, image):
+                return torch.zeros(3, 8, 8)
+    """,
+    "musetalk/utils/blending.py": """
+        import numpy as np
+
+
+        def get_crop_box(box, expand):
+            x, y, x1, y1 = box
+            x_c, y_c = (x + x1) // 2, (y + y1) // 2
+            w, h = x1 - x, y1 - y
+            s = int(max(w, h) // 2 * expand)
+            return [x_c - s, y_c - s, x_c + s, y_c + s], s
+
+
+        def get_image_prepare_material(image, face_box, upper_boundary_ratio=0.5, expand=1.5, fp=None, mode="raw"):
+            crop_box, _ = get_crop_box(face_box, expand)
+            x_s, y_s, x_e, y_e = crop_box
+            return np.full((y_e - y_s, x_e - x_s, 3), 255, dtype=np.uint8), crop_box
+    """,
+}
+
+
+def write_fake_musetalk(path):
+    for name, source in FAKE_MUSETALK.items():
+        target = path / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(textwrap.dedent(source))
+    return path
+
+
+def test_mask_shard_runs_in_a_spawned_worker(tmp_path):
+    musetalk = write_fake_musetalk(tmp_path / "MuseTalk")
+    shape = (5, 64, 64, 3)
+    frames_path = str(tmp_path / "frames.raw")
+    frames = np.memmap(frames_path, dtype=np.uint8, mode="w+", shape=shape)
+    frames[:] = 100
+    frames.flush()
+    coords = [(16, 16, 48, 48)] * 3
+
+    # Same pool setup as Avatar._prepare_material_sharded: the child imports
+    # src.services.avatar from scratch
+    with ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_prepare_worker,
+        initargs=(str(musetalk), "v15"),
+    ) as pool:
+        start, masks, crop_boxes, _ = pool.submit(
+            _mask_shard, 1, 4, frames_path, shape, coords, "jaw", 2
+        ).result(timeout=300)
+
+    assert start == 1
+    assert len(masks) == len(crop_boxes) == 3
+    assert crop_boxes[0] == [8, 8, 56, 56]
+    assert masks[0].shape == (48, 48, 3)
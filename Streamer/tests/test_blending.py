@@ -0,0 +1,109 @@
+import copy
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("torch")
+
+from src.services.avatar import FACE_SIZE, blend_rois_batch, build_blend_plan, mask_to_roi
+
+
+def reference_image_blending(image, face, face_box, mask_array, crop_box):
+    """MuseTalk's ``get_image_blending`` (musetalk/utils/blending.py)."""
+    body = image
+    x, y, x1, y1 = face_box
+    x_s, y_s, x_e, y_e = crop_box
+    face_large = copy.deepcopy(body[y_s:y_e, x_s:x_e])
+    face_large[y - y_s : y1 - y_s, x - x_s : x1 - x_s] = face
+    mask_image = cv2.cvtColor(mask_array, cv2.COLOR_BGR2GRAY)
+    mask_image = (mask_image / 255).astype(np.float32)
+    body[y_s:y_e, x_s:x_e] = cv2.blendLinear(
+        face_large, body[y_s:y_e, x_s:x_e], mask_image, 1 - mask_image
+    )
+    return body
+
+
+def make_case(rng, frame_shape, face_box, crop_box):
+    """Random frame, face resized to ``face_box`` and a soft mask over ``crop_box``."""
+    x1, y1, x2, y2 = face_box
+    x_s, y_s, x_e, y_e = crop_box
+    frame = rng.integers(0, 256, size=frame_shape, dtype=np.uint8)
+    face = rng.integers(0, 256, size=(y2 - y1, x2 - x1, 3), dtype=np.uint8)
+    mask = np.zeros((y_e - y_s, x_e - x_s), dtype=np.uint8)
+    # Lower half of the crop, partly outside the face box, with a feathered edge
+    mask[(y_e - y_s) // 2 :, 4:-4] = 255
+    mask = cv2.GaussianBlur(mask, (15, 15), 0)
+    return frame, face, cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
+
+
+def test_blend_rois_batch_matches_get_image_blending():
+    rng = np.random.default_rng(0)
+    cases = [
+        ((120, 100, 3), (20, 30, 80, 100), (10, 15, 90, 115)),
+        ((96, 128, 3), (40, 10, 90, 70), (30, 0, 100, 80)),
+        ((64, 64, 3), (0, 0, 64, 64), (0, 0, 64, 64)),
+    ]
+    frames, faces, masks, boxes, expected = [], [], [], [], []
+    for frame_shape, face_box, crop_box in cases:
+        frame, face, mask = make_case(rng, frame_shape, face_box, crop_box)
+        expected.append(reference_image_blending(frame.copy(), face, face_box, mask, crop_box))
+        roi, box = mask_to_roi(mask, crop_box, face_box, frame.shape)
+        x1, y1 = face_box[:2]
+        frames.append(frame)
+        faces.append(face[box[1] - y1 : box[3] - y1, box[0] - x1 : box[2] - x1])
+        masks.append(roi)
+        boxes.append(box)
+
+    blend_rois_batch(frames, faces, masks, boxes)
+
+    for frame, reference in zip(frames, expected):
+        diff = np.abs(frame.astype(np.int16) - reference.astype(np.int16))
+        assert diff.max() <= 1
+
+
+def test_blend_rois_batch_skips_empty_rois():
+    frame = np.full((16, 16, 3), 7, dtype=np.uint8)
+    face = np.zeros((0, 0, 3), dtype=np.uint8)
+    mask = np.zeros((0, 0), dtype=np.uint8)
+
+    blend_rois_batch([frame], [face], [mask], [[4, 4, 4, 4]])
+
+    assert (frame == 7).all()
+
+
+@pytest.mark.parametrize(
+    "bbox, mask_box",
+    [
+        ((10, 20, 190, 230), (30, 120, 170, 230)),  # downscale, lower-face ROI
+        ((0, 0, 300, 280), (5, 100, 295, 280)),  # upscale
+        ((50, 40, 178, 168), (50, 40, 178, 168)),  # ROI covers the whole bbox
+        ((3, 4, 259, 260), (3, 130, 259, 260)),  # same size as the face
+    ],
+)
+def test_blend_plan_matches_resize_and_crop(bbox, mask_box):
+    face = np.random.default_rng(1).integers(0, 256, size=(FACE_SIZE, FACE_SIZE, 3), dtype=np.uint8)
+    x1, y1, x2, y2 = bbox
+    mx1, my1, mx2, my2 = mask_box
+    resized = cv2.resize(face, (x2 - x1, y2 - y1))
+    expected = resized[my1 - y1 : my2 - y1, mx1 - x1 : mx2 - x1]
+
+    plan = build_blend_plan([bbox], [mask_box])
+    warped = cv2.warpAffine(
+        face,
+        plan[0],
+        (mx2 - mx1, my2 - my1),
+        flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+        borderMode=cv2.BORDER_REPLICATE,
+    )
+
+    assert warped.shape == expected.shape
+    assert np.abs(warped.astype(np.int16) - expected.astype(np.int16)).max() <= 1
+
+
+def test_blend_plan_degenerate_bbox_is_empty():
+    plan = build_blend_plan([(10, 10, 10, 40), (0, 0, 64, 64)], [(10, 10, 10, 10), (0, 32, 64, 64)])
+
+    assert plan.shape == (2, 2, 3)
+    assert not plan[0].any()
+    assert plan[1].any()
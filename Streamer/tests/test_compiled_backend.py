@@ -0,0 +1,39 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("torch")
+
+from src.services.compiled_backend import _artifact_key
+
+PROFILE = SimpleNamespace(name="cpu-fp32")
+
+
+def write_models(root):
+    (root / "sd-vae").mkdir()
+    (root / "sd-vae" / "config.json").write_text("{}")
+    (root / "sd-vae" / "diffusion_pytorch_model.bin").write_bytes(b"\0" * 16)
+    (root / "unet.bin").write_bytes(b"\0" * 32)
+    return [str(root / "unet.bin"), str(root / "sd-vae")]
+
+
+def test_artifact_key_is_stable(tmp_path):
+    paths = write_models(tmp_path)
+
+    assert _artifact_key(paths, PROFILE, [50, 384]) == _artifact_key(paths, PROFILE, [50, 384])
+    assert _artifact_key(paths, PROFILE, [50, 384]) != _artifact_key(paths, PROFILE, [60, 384])
+
+
+def test_artifact_key_changes_when_a_file_inside_a_model_directory_is_replaced(tmp_path):
+    paths = write_models(tmp_path)
+    vae_dir = tmp_path / "sd-vae"
+    before = _artifact_key(paths, PROFILE, [])
+    dir_mtime = os.stat(vae_dir).st_mtime_ns
+
+    weights = vae_dir / "diffusion_pytorch_model.bin"
+    weights.write_bytes(b"\1" * 24)
+    os.utime(vae_dir, ns=(dir_mtime, dir_mtime))
+
+    assert os.stat(vae_dir).st_mtime_ns == dir_mtime
+    assert _artifact_key(paths, PROFILE, []) != before
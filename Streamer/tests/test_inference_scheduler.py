@@ -0,0 +1,54 @@
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from src.services.inference_scheduler import InferenceScheduler
+
+
+class FakeUNet:
+    def model(self, latents, timesteps, encoder_hidden_states=None):
+        return SimpleNamespace(sample=latents + encoder_hidden_states)
+
+
+class FakeVAE:
+    vae = SimpleNamespace(dtype=torch.float32)
+
+    def decode_latents(self, latents):
+        return [latent.sum().item() for latent in latents]
+
+
+def make_scheduler():
+    profile = SimpleNamespace(context=contextlib.nullcontext)
+    return InferenceScheduler(FakeUNet(), FakeVAE(), torch.tensor([0]), profile)
+
+
+def test_scheduler_merges_sessions_and_splits_results():
+    scheduler = make_scheduler()
+    a = scheduler.submit("a", torch.ones(2, 1), torch.zeros(2, 1))
+    b = scheduler.submit("b", torch.full((3, 1), 2.0), torch.ones(3, 1))
+
+    assert a.result(timeout=10)[0] == [1.0, 1.0]
+    assert b.result(timeout=10)[0] == [3.0, 3.0, 3.0]
+    scheduler.release("a")
+    scheduler.release("b")
+    scheduler.close()
+
+
+def test_closed_scheduler_serves_registered_sessions_then_stops():
+    scheduler = make_scheduler()
+    scheduler.register("a")
+    scheduler.submit("a", torch.ones(1, 1), torch.ones(1, 1)).result(timeout=10)
+    threads = list(scheduler._threads)
+
+    scheduler.close()
+    # Still running: the session was registered before the scheduler was replaced
+    assert scheduler.submit("a", torch.ones(1, 1), torch.zeros(1, 1)).result(timeout=10)[0] == [1.0]
+    assert all(thread.is_alive() for thread in threads)
+
+    scheduler.release("a")
+    for thread in threads:
+        thread.join(timeout=10)
+        assert not thread.is_alive()
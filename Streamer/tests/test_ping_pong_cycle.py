@@ -0,0 +1,28 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+
+from src.services.avatar import PingPongCycle, cycle_position
+
+
+@pytest.mark.parametrize("length", [1, 2, 3, 8, 25])
+def test_cycle_position_matches_materialized_cycle(length):
+    seq = list(range(length))
+    materialized = seq + seq[::-1]
+
+    for idx in range(-3 * length, 5 * length):
+        assert seq[cycle_position(idx, length)] == materialized[idx % len(materialized)]
+
+
+@pytest.mark.parametrize("length", [1, 4, 7])
+def test_ping_pong_cycle_matches_materialized_cycle(length):
+    frames = [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(length)]
+    materialized = frames + frames[::-1]
+    cycle = PingPongCycle(frames)
+
+    assert len(cycle) == len(materialized)
+    for idx in range(3 * len(materialized)):
+        assert cycle[idx] is materialized[idx % len(materialized)]
+    assert [id(frame) for frame in cycle] == [id(frame) for frame in materialized]